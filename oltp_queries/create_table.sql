@@ -6,9 +6,15 @@ CREATE TABLE bronze_patients (
     last_name VARCHAR(255)
 );
 
+-- Tabelas de fatos Bronze aceitam reentregas: a chave natural pode se repetir entre cargas,
+-- cada linha recebida tem sua chave de carga (load_id) e a deduplicação "last-write-wins"
+-- é feita na extração para a Silver (ver scripts/dedup.py).
+-- Bancos criados antes desta mudança: executar migrate_bronze_redeliveries.sql
+
 -- Tabela bronze_claims
 CREATE TABLE bronze_claims (
-    claim_id VARCHAR(255) PRIMARY KEY,
+    load_id BIGSERIAL PRIMARY KEY,
+    claim_id VARCHAR(255) NOT NULL,
     patient_id VARCHAR(255),
     provider_id VARCHAR(255),
     claim_start_date DATE,
@@ -16,21 +22,28 @@ CREATE TABLE bronze_claims (
     outstanding_primary DECIMAL(10, 2),
     outstanding_secondary DECIMAL(10, 2),
     outstanding_patient DECIMAL(10, 2),
+    loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (patient_id) REFERENCES bronze_patients(patient_id)
 );
+CREATE INDEX idx_bronze_claims_claim_id ON bronze_claims (claim_id);
 
 -- Tabela bronze_claims_transactions
+-- claim_id não é único em bronze_claims (reentregas), então não há FK para ela:
+-- a transação referencia o claim pela chave natural, única apenas após a deduplicação
 CREATE TABLE bronze_claims_transactions (
-    transaction_id VARCHAR(255) PRIMARY KEY,
+    load_id BIGSERIAL PRIMARY KEY,
+    transaction_id VARCHAR(255) NOT NULL,
     claim_id VARCHAR(255),
     patient_id VARCHAR(255),
     provider_id VARCHAR(255),
     transaction_date DATE,
     transaction_amount DECIMAL(10, 2),
     procedure_code VARCHAR(255),
-    FOREIGN KEY (claim_id) REFERENCES bronze_claims(claim_id),
+    loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (patient_id) REFERENCES bronze_patients(patient_id)
 );
+CREATE INDEX idx_bronze_claims_transactions_transaction_id ON bronze_claims_transactions (transaction_id);
+CREATE INDEX idx_bronze_claims_transactions_claim_id ON bronze_claims_transactions (claim_id);
 
 -- Tabela bronze_payers
 CREATE TABLE bronze_payers (
@@ -40,7 +53,8 @@ CREATE TABLE bronze_payers (
 
 -- Tabela bronze_encounters
 CREATE TABLE bronze_encounters (
-    encounter_id VARCHAR(255) PRIMARY KEY,
+    load_id BIGSERIAL PRIMARY KEY,
+    encounter_id VARCHAR(255) NOT NULL,
     encounter_date DATE,
     discharge_date DATE,
     patient_id VARCHAR(255),
@@ -49,6 +63,8 @@ CREATE TABLE bronze_encounters (
     encounter_type VARCHAR(255),
     total_claim_cost DECIMAL(10, 2),
     payer_coverage DECIMAL(10, 2),
+    loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (patient_id) REFERENCES bronze_patients(patient_id),
     FOREIGN KEY (payer_id) REFERENCES bronze_payers(payer_id)
-);
\ No newline at end of file
+);
+CREATE INDEX idx_bronze_encounters_encounter_id ON bronze_encounters (encounter_id);
\ No newline at end of file
@@ -126,13 +126,13 @@ ORDER BY dp.age_group;
 EXPLAIN ANALYSE
 SELECT
     CASE
-        WHEN (CURRENT_DATE - sp.date_of_birth) / 365.25 <= 12 THEN '0-12'
-        WHEN (CURRENT_DATE - sp.date_of_birth) / 365.25 <= 17 THEN '13-17'
-        WHEN (CURRENT_DATE - sp.date_of_birth) / 365.25 <= 25 THEN '18-25'
-        WHEN (CURRENT_DATE - sp.date_of_birth) / 365.25 <= 35 THEN '26-35'
-        WHEN (CURRENT_DATE - sp.date_of_birth) / 365.25 <= 45 THEN '36-45'
-        WHEN (CURRENT_DATE - sp.date_of_birth) / 365.25 <= 60 THEN '46-60'
-        WHEN (CURRENT_DATE - sp.date_of_birth) / 365.25 <= 75 THEN '61-75'
+        WHEN DATE_PART('year', AGE(CURRENT_DATE, sp.date_of_birth)) <= 12 THEN '0-12'
+        WHEN DATE_PART('year', AGE(CURRENT_DATE, sp.date_of_birth)) <= 17 THEN '13-17'
+        WHEN DATE_PART('year', AGE(CURRENT_DATE, sp.date_of_birth)) <= 25 THEN '18-25'
+        WHEN DATE_PART('year', AGE(CURRENT_DATE, sp.date_of_birth)) <= 35 THEN '26-35'
+        WHEN DATE_PART('year', AGE(CURRENT_DATE, sp.date_of_birth)) <= 45 THEN '36-45'
+        WHEN DATE_PART('year', AGE(CURRENT_DATE, sp.date_of_birth)) <= 60 THEN '46-60'
+        WHEN DATE_PART('year', AGE(CURRENT_DATE, sp.date_of_birth)) <= 75 THEN '61-75'
         ELSE '75+'
     END AS faixa_etaria,
     COUNT(sfc.claim_id) AS total_claims
@@ -0,0 +1,33 @@
+-- Migração de bancos criados antes de as tabelas de fatos Bronze aceitarem reentregas.
+-- Idempotente: pode ser executada mais de uma vez.
+--
+-- Linhas já existentes recebem load_id na ordem física atual da tabela e loaded_at igual ao
+-- momento da migração; a partir daí, a ordem de chegada é registrada corretamente.
+
+-- A FK de transações para claims depende de claim_id ser único em bronze_claims
+ALTER TABLE bronze_claims_transactions DROP CONSTRAINT IF EXISTS bronze_claims_transactions_claim_id_fkey;
+
+-- bronze_claims
+ALTER TABLE bronze_claims ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE bronze_claims ADD COLUMN IF NOT EXISTS load_id BIGSERIAL;
+ALTER TABLE bronze_claims DROP CONSTRAINT IF EXISTS bronze_claims_pkey;
+ALTER TABLE bronze_claims ADD PRIMARY KEY (load_id);
+ALTER TABLE bronze_claims ALTER COLUMN claim_id SET NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_bronze_claims_claim_id ON bronze_claims (claim_id);
+
+-- bronze_claims_transactions
+ALTER TABLE bronze_claims_transactions ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE bronze_claims_transactions ADD COLUMN IF NOT EXISTS load_id BIGSERIAL;
+ALTER TABLE bronze_claims_transactions DROP CONSTRAINT IF EXISTS bronze_claims_transactions_pkey;
+ALTER TABLE bronze_claims_transactions ADD PRIMARY KEY (load_id);
+ALTER TABLE bronze_claims_transactions ALTER COLUMN transaction_id SET NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_bronze_claims_transactions_transaction_id ON bronze_claims_transactions (transaction_id);
+CREATE INDEX IF NOT EXISTS idx_bronze_claims_transactions_claim_id ON bronze_claims_transactions (claim_id);
+
+-- bronze_encounters
+ALTER TABLE bronze_encounters ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE bronze_encounters ADD COLUMN IF NOT EXISTS load_id BIGSERIAL;
+ALTER TABLE bronze_encounters DROP CONSTRAINT IF EXISTS bronze_encounters_pkey;
+ALTER TABLE bronze_encounters ADD PRIMARY KEY (load_id);
+ALTER TABLE bronze_encounters ALTER COLUMN encounter_id SET NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_bronze_encounters_encounter_id ON bronze_encounters (encounter_id);
@@ -1,4 +1,5 @@
 import os
+import sys
 # import pandas as pd # Não necessário para este script específico
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
@@ -117,5 +118,33 @@ def load_bronze():
     except Exception as e:
         print(f"Ocorreu um erro inesperado durante a carga da camada Bronze: {e}")
 
+def migrate_bronze():
+    """
+    Migra um banco Bronze existente para aceitar reentregas nas tabelas de fatos
+    (chave de carga load_id e coluna loaded_at no lugar da chave natural como PK).
+    """
+    engine = get_engine(echo=False)
+    if engine is None:
+        print("Não foi possível criar conexão com o banco de dados. Abortando a migração da camada Bronze.")
+        return
+
+    migration_sql_path = os.path.join("../oltp_queries", "migrate_bronze_redeliveries.sql")
+    try:
+        print(f"Executando script de migração: {migration_sql_path}")
+        with open(migration_sql_path, "r", encoding="utf-8") as f:
+            migration_sql = f.read()
+        with engine.begin() as conn:
+            conn.execute(text(migration_sql))
+        print("Migração da camada Bronze concluída com sucesso.")
+    except FileNotFoundError as fnfe:
+        print(f"Erro: {fnfe}")
+    except SQLAlchemyError as e:
+        print(f"Erro ao executar a migração: {e}")
+
 if __name__ == "__main__":
-    load_bronze()
\ No newline at end of file
+    # Use 'python 1_bronze_layer_construction.py --migrate' para atualizar um banco criado antes
+    # de as tabelas de fatos aceitarem reentregas
+    if "--migrate" in sys.argv:
+        migrate_bronze()
+    else:
+        load_bronze()
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
 from dotenv import load_dotenv
@@ -6,6 +7,10 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 import pytz # Para lidar com fusos horários se necessário em timestamps
+from engines import engine_step, get_active_engine
+from checkpoint import StageRunner, compute_fingerprint
+from dedup import read_deduplicated
+from sampling import connect_args, prepare_sample_schema, bronze_table, bronze_query, patient_filter, claim_filter
 
 # -------------------------------
 # Variáveis e Funções de Conexão
@@ -15,9 +20,13 @@ import pytz # Para lidar com fusos horários se necessário em timestamps
 path_to_env = "../.env"
 load_dotenv(dotenv_path=path_to_env, override=True)
 
-def get_engine(echo=False):
+def get_engine(echo=False, search_path=None):
     """
     Cria e retorna o engine de conexão com o banco de dados PostgreSQL.
+
+    Args:
+        search_path (str, optional): Schema(s) em que as tabelas não qualificadas são lidas
+            e gravadas (ex.: o schema de uma escala do benchmark). Por padrão, o do modo amostra, se ativo.
     """
     try:
         pg_user = os.getenv('PG_USER')
@@ -31,11 +40,14 @@ def get_engine(echo=False):
                              "Verifique seu arquivo .env.")
 
         url = f"postgresql+psycopg2://{pg_user}:{pg_pass}@{pg_host}:{pg_port}/{pg_db}"
-        engine = create_engine(url, pool_pre_ping=True, echo=echo)
+        # Em modo amostra (SAMPLE_RATE), o search_path aponta para o schema da amostra
+        engine = create_engine(url, pool_pre_ping=True, echo=echo, connect_args=connect_args(search_path))
 
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
         print("Conexão com o banco de dados PostgreSQL estabelecida com sucesso.")
+        if search_path is None:
+            prepare_sample_schema(engine)
         return engine
 
     except ValueError as ve:
@@ -171,6 +183,20 @@ def transform_payers_to_silver(df):
     df_silver = df[['payer_sk', 'payer_id', 'payer_name', 'dw_created_at', 'dw_updated_at']].copy()
     return df_silver
 
+@engine_step("""
+    SELECT row_number() OVER (ORDER BY source, position) AS provider_sk, provider_id,
+           'Provider ' || provider_id AS provider_name, $now_utc AS dw_created_at, $now_utc AS dw_updated_at
+    FROM (
+        SELECT provider_id, source, position FROM (
+            SELECT provider_id, 0 AS source, min(__row_id) AS position
+            FROM bronze_claims_df WHERE provider_id IS NOT NULL GROUP BY provider_id
+            UNION ALL
+            SELECT provider_id, 1 AS source, min(__row_id) AS position
+            FROM bronze_encounters_df WHERE provider_id IS NOT NULL GROUP BY provider_id
+        ) QUALIFY row_number() OVER (PARTITION BY provider_id ORDER BY source) = 1
+    )
+    ORDER BY provider_sk
+""")
 def transform_providers_to_silver(bronze_claims_df, bronze_encounters_df):
     """
     Identifica provedores únicos das tabelas bronze_claims e bronze_encounters,
@@ -197,6 +223,22 @@ def transform_providers_to_silver(bronze_claims_df, bronze_encounters_df):
     df_silver = all_providers[['provider_sk', 'provider_id', 'provider_name', 'dw_created_at', 'dw_updated_at']].copy()
     return df_silver
 
+@engine_step("""
+    SELECT c.claim_id, p.patient_sk, pr.provider_sk, c.claim_start_date,
+           CASE WHEN c.claim_start_date > c.claim_end_date THEN NULL ELSE c.claim_end_date END AS claim_end_date,
+           c.total_outstanding, $now_utc AS dw_created_at, $now_utc AS dw_updated_at
+    FROM (
+        SELECT __row_id, claim_id, patient_id, provider_id,
+               TRY_CAST(claim_start_date AS TIMESTAMP) AS claim_start_date,
+               TRY_CAST(claim_end_date AS TIMESTAMP) AS claim_end_date,
+               coalesce(TRY_CAST(outstanding_primary AS DOUBLE), 0) + coalesce(TRY_CAST(outstanding_secondary AS DOUBLE), 0)
+                   + coalesce(TRY_CAST(outstanding_patient AS DOUBLE), 0) AS total_outstanding
+        FROM bronze_claims_df
+    ) AS c
+    LEFT JOIN silver_patients_df AS p ON p.patient_id = c.patient_id
+    LEFT JOIN silver_providers_df AS pr ON pr.provider_id = c.provider_id
+    ORDER BY c.__row_id, p.__row_id, pr.__row_id
+""")
 def transform_claims_to_silver(bronze_claims_df, silver_patients_df, silver_providers_df):
     """
     Transforma dados de claims da camada Bronze para Silver,
@@ -232,6 +274,17 @@ def transform_claims_to_silver(bronze_claims_df, silver_patients_df, silver_prov
                     'total_outstanding', 'dw_created_at', 'dw_updated_at']].copy()
     return df_silver
 
+@engine_step("""
+    SELECT t.transaction_id, t.claim_id, p.patient_sk, pr.provider_sk,
+           TRY_CAST(t.transaction_date AS TIMESTAMP) AS transaction_date,
+           coalesce(TRY_CAST(t.transaction_amount AS DOUBLE), 0) AS transaction_amount,
+           coalesce(upper(py_strip(t.procedure_code)), 'UNKNOWN_CODE') AS procedure_code,
+           $now_utc AS dw_created_at, $now_utc AS dw_updated_at
+    FROM bronze_claims_transactions_df AS t
+    LEFT JOIN silver_patients_df AS p ON p.patient_id = t.patient_id
+    LEFT JOIN silver_providers_df AS pr ON pr.provider_id = t.provider_id
+    ORDER BY t.__row_id, p.__row_id, pr.__row_id
+""")
 def transform_claims_transactions_to_silver(bronze_claims_transactions_df, silver_patients_df, silver_providers_df, silver_claims_df):
     """
     Transforma dados de transações de claims, enriquecendo-os com SKs de dimensões.
@@ -256,6 +309,29 @@ def transform_claims_transactions_to_silver(bronze_claims_transactions_df, silve
                     'transaction_amount', 'procedure_code', 'dw_created_at', 'dw_updated_at']].copy()
     return df_silver
 
+@engine_step("""
+    SELECT e.encounter_id, p.patient_sk, pr.provider_sk, py.payer_sk, e.encounter_date, e.discharge_date,
+           e.encounter_type, e.total_claim_cost, e.payer_coverage,
+           CASE WHEN date_diff('day', e.encounter_date, e.discharge_date) < 0 THEN 0
+                ELSE date_diff('day', e.encounter_date, e.discharge_date) END AS length_of_stay_days,
+           $now_utc AS dw_created_at, $now_utc AS dw_updated_at
+    FROM (
+        SELECT __row_id, encounter_id, patient_id, provider_id, payer_id, encounter_date,
+               CASE WHEN encounter_date > discharge_date THEN NULL ELSE discharge_date END AS discharge_date,
+               coalesce(py_title(py_strip(encounter_type)), 'Unknown Type') AS encounter_type,
+               coalesce(TRY_CAST(total_claim_cost AS DOUBLE), 0) AS total_claim_cost,
+               coalesce(TRY_CAST(payer_coverage AS DOUBLE), 0) AS payer_coverage
+        FROM (
+            SELECT * REPLACE (TRY_CAST(encounter_date AS TIMESTAMP) AS encounter_date,
+                              TRY_CAST(discharge_date AS TIMESTAMP) AS discharge_date)
+            FROM bronze_encounters_df
+        )
+    ) AS e
+    LEFT JOIN silver_patients_df AS p ON p.patient_id = e.patient_id
+    LEFT JOIN silver_providers_df AS pr ON pr.provider_id = e.provider_id
+    LEFT JOIN silver_payers_df AS py ON py.payer_id = e.payer_id
+    ORDER BY e.__row_id, p.__row_id, pr.__row_id, py.__row_id
+""")
 def transform_encounters_to_silver(bronze_encounters_df, silver_patients_df, silver_providers_df, silver_payers_df):
     """
     Transforma dados de encounters da camada Bronze para Silver,
@@ -301,66 +377,117 @@ def transform_encounters_to_silver(bronze_encounters_df, silver_patients_df, sil
 # -------------------------------
 # Função Principal de Carregamento da Camada Silver
 # -------------------------------
-def load_silver():
-    engine = get_engine()
+def load_silver(resume=False, engine=None):
+    """
+    Carrega a camada Silver a partir da Bronze.
+
+    Args:
+        resume (bool): Se True, pula as tabelas já concluídas cujas entradas não mudaram.
+        engine (sqlalchemy.engine.Engine, optional): Conexão a usar; por padrão, a do .env.
+
+    Returns:
+        bool: True se a carga foi concluída; False se falhou (o erro é impresso).
+    """
+    if engine is None:
+        engine = get_engine()
     if engine is None:
         print("Não foi possível conectar ao banco de dados. Abortando a carga da camada Silver.")
-        return
+        return False
+
+    try:
+        print(f"Engine de DataFrame: {get_active_engine().name}")
+    except (ValueError, ImportError) as e:
+        print(f"Erro ao inicializar a engine de DataFrame: {e}")
+        return False
 
     try:
         print("Lendo dados da camada Bronze...")
         # Adicionar dtypes para colunas relevantes para garantir consistência
         # 'provider_id' e 'patient_id' podem ser string para merges mais robustos
         # 'date_of_birth' pode ser lido como string e convertido depois na transformação
-        patients_bronze = pd.read_sql("SELECT * FROM bronze_patients", engine)
-        claims_bronze = pd.read_sql("SELECT * FROM bronze_claims", engine)
-        claims_transactions_bronze = pd.read_sql("SELECT * FROM bronze_claims_transactions", engine)
-        payers_bronze = pd.read_sql("SELECT * FROM bronze_payers", engine)
-        encounters_bronze = pd.read_sql("SELECT * FROM bronze_encounters", engine)
+        # Em modo amostra, o filtro de pacientes é aplicado a pacientes, claims e encontros, e as
+        # transações seguem o claim a que pertencem; payers não dependem de pacientes e são lidos por completo.
+        # Nos fatos, o filtro vale para a versão mais recente de cada chave (antes da deduplicação, uma
+        # versão antiga de um claim movido para fora da amostra permaneceria nela)
+        patients_bronze = pd.read_sql(bronze_query("bronze_patients"), engine)
+        payers_bronze = pd.read_sql(bronze_query("bronze_payers", sampled=False), engine)
+
+        # Fatos podem chegar repetidos entre cargas: deduplicação em chunks pela chave natural,
+        # mantendo a versão carregada por último
+        claims_bronze, claims_dups = read_deduplicated(
+            engine, bronze_table("bronze_claims"), ["claim_id"], sample=patient_filter())
+        claims_transactions_bronze, transactions_dups = read_deduplicated(
+            engine, bronze_table("bronze_claims_transactions"), ["transaction_id"], sample=claim_filter(engine))
+        encounters_bronze, encounters_dups = read_deduplicated(
+            engine, bronze_table("bronze_encounters"), ["encounter_id"], sample=patient_filter())
+        print(f"Duplicatas removidas: bronze_claims={claims_dups}, "
+              f"bronze_claims_transactions={transactions_dups}, bronze_encounters={encounters_dups}")
         print("Extração da camada Bronze concluída.")
 
     except SQLAlchemyError as e:
         print(f"Erro ao extrair dados da camada Bronze: {e}")
-        return
+        return False
     except Exception as e:
         print(f"Erro inesperado durante a extração: {e}")
-        return
+        return False
 
     try:
+        # Cada tabela é uma etapa com checkpoint; em modo resume, etapas concluídas
+        # cujas entradas não mudaram são puladas
+        stages = StageRunner(engine, "silver", resume=resume)
+        fingerprints = {}
+
         print("Aplicando transformações para a camada Silver (Dimensões primeiro)...")
         # --- Transformações para Dimensões (Entities) ---
-        silver_patients = transform_patients_to_silver(patients_bronze)
-        silver_payers = transform_payers_to_silver(payers_bronze)
-        # Providers são inferidos de claims e encounters
-        silver_providers = transform_providers_to_silver(claims_bronze, encounters_bronze)
-        
         # Carregar as dimensões primeiro, pois os fatos dependem delas
-        print("Carregando tabelas de Dimensão na camada Silver...")
-        silver_patients.to_sql("silver_dim_patient", engine, if_exists="replace", index=False)
-        silver_payers.to_sql("silver_dim_payer", engine, if_exists="replace", index=False)
-        silver_providers.to_sql("silver_dim_provider", engine, if_exists="replace", index=False)
+        # A idade depende da data corrente: a data de referência entra no fingerprint
+        fingerprints["silver_dim_patient"] = compute_fingerprint(
+            transform_patients_to_silver, patients_bronze, datetime.now(pytz.utc).date())
+        silver_patients = stages.run("silver_dim_patient", fingerprints["silver_dim_patient"],
+                                     lambda: transform_patients_to_silver(patients_bronze))
+        fingerprints["silver_dim_payer"] = compute_fingerprint(transform_payers_to_silver, payers_bronze)
+        silver_payers = stages.run("silver_dim_payer", fingerprints["silver_dim_payer"],
+                                   lambda: transform_payers_to_silver(payers_bronze))
+        # Providers são inferidos de claims e encounters
+        fingerprints["silver_dim_provider"] = compute_fingerprint(transform_providers_to_silver, claims_bronze, encounters_bronze)
+        silver_providers = stages.run("silver_dim_provider", fingerprints["silver_dim_provider"],
+                                      lambda: transform_providers_to_silver(claims_bronze, encounters_bronze))
         print("Dimensões da camada Silver carregadas.")
 
 
         print("Aplicando transformações para a camada Silver (Fatos em seguida)...")
         # --- Transformações para Fatos (Eventos/Medidas) ---
-        # Estes dependem das SKs das dimensões já criadas
-        silver_claims = transform_claims_to_silver(claims_bronze, silver_patients, silver_providers)
+        # Estes dependem das SKs das dimensões já criadas, por isso o fingerprint inclui o das dimensões
+        fingerprints["silver_fact_claim"] = compute_fingerprint(
+            transform_claims_to_silver, claims_bronze, fingerprints["silver_dim_patient"], fingerprints["silver_dim_provider"])
+        silver_claims = stages.run("silver_fact_claim", fingerprints["silver_fact_claim"],
+                                   lambda: transform_claims_to_silver(claims_bronze, silver_patients, silver_providers),
+                                   read_back=False)
         # Passar silver_claims_df para a função transform_claims_transactions_to_silver é opcional,
         # pois ela não usa claim_sk ainda. Apenas os DataFrames de dimensões são estritamente necessários para SKs.
-        silver_claims_transactions = transform_claims_transactions_to_silver(claims_transactions_bronze, silver_patients, silver_providers, silver_claims)
-        silver_encounters = transform_encounters_to_silver(encounters_bronze, silver_patients, silver_providers, silver_payers)
-
-        print("Carregando tabelas de Fato na camada Silver...")
-        silver_claims.to_sql("silver_fact_claim", engine, if_exists="replace", index=False)
-        silver_claims_transactions.to_sql("silver_fact_claim_transaction", engine, if_exists="replace", index=False)
-        silver_encounters.to_sql("silver_fact_encounter", engine, if_exists="replace", index=False)
+        fingerprints["silver_fact_claim_transaction"] = compute_fingerprint(
+            transform_claims_transactions_to_silver, claims_transactions_bronze,
+            fingerprints["silver_dim_patient"], fingerprints["silver_dim_provider"])
+        stages.run("silver_fact_claim_transaction", fingerprints["silver_fact_claim_transaction"],
+                   lambda: transform_claims_transactions_to_silver(claims_transactions_bronze, silver_patients, silver_providers, silver_claims),
+                   read_back=False)
+        fingerprints["silver_fact_encounter"] = compute_fingerprint(
+            transform_encounters_to_silver, encounters_bronze, fingerprints["silver_dim_patient"],
+            fingerprints["silver_dim_provider"], fingerprints["silver_dim_payer"])
+        stages.run("silver_fact_encounter", fingerprints["silver_fact_encounter"],
+                   lambda: transform_encounters_to_silver(encounters_bronze, silver_patients, silver_providers, silver_payers),
+                   read_back=False)
         print("Fatos da camada Silver carregados.")
 
+        if stages.skipped:
+            print(f"Etapas retomadas do checkpoint: {', '.join(stages.skipped)}")
         print("\nCarga da camada Silver concluída com sucesso.")
+        return True
 
     except Exception as e:
         print(f"Erro durante a transformação ou carga da camada Silver: {e}")
+        return False
 
 if __name__ == "__main__":
-    load_silver()
\ No newline at end of file
+    # Use 'python 2_silver_layer_construction.py --resume' para retomar uma execução que falhou
+    load_silver(resume="--resume" in sys.argv)
@@ -1,4 +1,5 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
 from dotenv import load_dotenv
@@ -6,6 +7,11 @@ from sqlalchemy import create_engine, text, types
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 import pytz
+from query_service import bump_gold_version
+from engines import engine_step, get_active_engine
+from checkpoint import StageRunner, compute_fingerprint
+from analytic_mart import publish_gold_to_mart, MART_DIR
+from sampling import connect_args, prepare_sample_schema, sample_mart_dir
 
 # -------------------------------
 # Variáveis e Funções de Conexão
@@ -26,9 +32,11 @@ def get_engine(echo=False):
         if not all([pg_user, pg_pass, pg_host, pg_port, pg_db]):
             raise ValueError("PostgreSQL env vars not set.")
         url = f"postgresql+psycopg2://{pg_user}:{pg_pass}@{pg_host}:{pg_port}/{pg_db}"
-        engine = create_engine(url, pool_pre_ping=True, echo=echo)
+        # Em modo amostra (SAMPLE_RATE), lê a Silver e grava a Gold apenas no schema da amostra
+        engine = create_engine(url, pool_pre_ping=True, echo=echo, connect_args=connect_args())
         with engine.connect() as conn: conn.execute(text("SELECT 1"))
         print("DB connection successful.")
+        prepare_sample_schema(engine)
         return engine
     except Exception as e:
         print(f"Error connecting to DB: {e}")
@@ -152,14 +160,45 @@ def build_generic_dimension(source_df, natural_key_col_source, sk_col_name, natu
                        **({description_col_name: f"Unknown {natural_key_col_name.replace('_', ' ').title()}"} if description_col_name else {})) \
                  .pipe(add_audit_columns)
 
+@engine_step("""
+    SELECT -1 AS procedure_sk, 'UNKNOWN' AS procedure_code, 'Unknown Procedure Code' AS procedure_description,
+           $now_utc AS dw_gold_created_at, $now_utc AS dw_gold_updated_at
+    UNION ALL
+    SELECT row_number() OVER (ORDER BY position), procedure_code, 'Procedure Code ' || procedure_code, $now_utc, $now_utc
+    FROM (SELECT procedure_code, min(__row_id) AS position FROM silver_claims_transactions_df
+          WHERE procedure_code IS NOT NULL GROUP BY procedure_code)
+    ORDER BY procedure_sk
+""")
 def build_dim_procedure(silver_claims_transactions_df):
     """Constrói a dimensão de procedimento."""
     return build_generic_dimension(silver_claims_transactions_df, 'procedure_code', 'procedure_sk', 'procedure_code', 'procedure_description')
 
+@engine_step("""
+    SELECT -1 AS encounter_type_sk, 'UNKNOWN' AS encounter_type,
+           $now_utc AS dw_gold_created_at, $now_utc AS dw_gold_updated_at
+    UNION ALL
+    SELECT row_number() OVER (ORDER BY position), encounter_type, $now_utc, $now_utc
+    FROM (SELECT encounter_type, min(__row_id) AS position FROM silver_encounters_df
+          WHERE encounter_type IS NOT NULL GROUP BY encounter_type)
+    ORDER BY encounter_type_sk
+""")
 def build_dim_encounter_type(silver_encounters_df):
     """Constrói a dimensão de tipo de encontro."""
     return build_generic_dimension(silver_encounters_df, 'encounter_type', 'encounter_type_sk', 'encounter_type')
 
+# Nas versões SQL, a dimensão de data é ligada pela data (e não pela chave em texto): datas nulas
+# ou fora do intervalo ficam sem correspondência e recebem -1, como a chave '9999-12-31' do pandas
+@engine_step("""
+    WITH dim_date_by_day AS (SELECT date_sk, TRY_CAST(date_key AS DATE) AS date FROM dim_date_df)
+    SELECT c.claim_id, CAST(coalesce(c.patient_sk, -1) AS BIGINT) AS patient_sk,
+           CAST(coalesce(c.provider_sk, -1) AS BIGINT) AS provider_sk,
+           coalesce(ds.date_sk, -1) AS claim_start_date_sk, coalesce(de.date_sk, -1) AS claim_end_date_sk,
+           c.total_outstanding, $now_utc AS dw_gold_created_at, $now_utc AS dw_gold_updated_at
+    FROM silver_claims_df AS c
+    LEFT JOIN dim_date_by_day AS ds ON ds.date = TRY_CAST(c.claim_start_date AS DATE)
+    LEFT JOIN dim_date_by_day AS de ON de.date = TRY_CAST(c.claim_end_date AS DATE)
+    ORDER BY c.__row_id
+""")
 def build_fact_claims(silver_claims_df, dim_date_df):
     """Constrói a tabela de fatos de claims."""
     # Garante que as SKs existentes sejam Int64 para aceitar pd.NA antes de usar merge_and_fill_sk
@@ -174,6 +213,21 @@ def build_fact_claims(silver_claims_df, dim_date_df):
      .pipe(add_audit_columns) \
      [['claim_id', 'patient_sk', 'provider_sk', 'claim_start_date_sk', 'claim_end_date_sk', 'total_outstanding', 'dw_gold_created_at', 'dw_gold_updated_at']]
 
+@engine_step("""
+    WITH dim_date_by_day AS (SELECT date_sk, TRY_CAST(date_key AS DATE) AS date FROM dim_date_df)
+    SELECT e.encounter_id, CAST(coalesce(e.patient_sk, -1) AS BIGINT) AS patient_sk,
+           CAST(coalesce(e.provider_sk, -1) AS BIGINT) AS provider_sk,
+           CAST(coalesce(e.payer_sk, -1) AS BIGINT) AS payer_sk,
+           coalesce(et.encounter_type_sk, -1) AS encounter_type_sk,
+           coalesce(de.date_sk, -1) AS encounter_date_sk, coalesce(dd.date_sk, -1) AS discharge_date_sk,
+           e.total_claim_cost, e.payer_coverage, e.length_of_stay_days,
+           $now_utc AS dw_gold_created_at, $now_utc AS dw_gold_updated_at
+    FROM silver_encounters_df AS e
+    LEFT JOIN dim_date_by_day AS de ON de.date = TRY_CAST(e.encounter_date AS DATE)
+    LEFT JOIN dim_date_by_day AS dd ON dd.date = TRY_CAST(e.discharge_date AS DATE)
+    LEFT JOIN dim_encounter_type_df AS et ON et.encounter_type = e.encounter_type
+    ORDER BY e.__row_id
+""")
 def build_fact_encounters(silver_encounters_df, dim_date_df, dim_encounter_type_df):
     """Constrói a tabela de fatos de encontros."""
     # Garante que as SKs existentes sejam Int64 para aceitar pd.NA antes de usar merge_and_fill_sk
@@ -192,6 +246,17 @@ def build_fact_encounters(silver_encounters_df, dim_date_df, dim_encounter_type_
      [['encounter_id', 'patient_sk', 'provider_sk', 'payer_sk', 'encounter_type_sk', 'encounter_date_sk', 
        'discharge_date_sk', 'total_claim_cost', 'payer_coverage', 'length_of_stay_days', 'dw_gold_created_at', 'dw_gold_updated_at']]
 
+@engine_step("""
+    WITH dim_date_by_day AS (SELECT date_sk, TRY_CAST(date_key AS DATE) AS date FROM dim_date_df)
+    SELECT t.transaction_id, t.claim_id, CAST(coalesce(t.patient_sk, -1) AS BIGINT) AS patient_sk,
+           CAST(coalesce(t.provider_sk, -1) AS BIGINT) AS provider_sk,
+           coalesce(dt.date_sk, -1) AS transaction_date_sk, coalesce(pc.procedure_sk, -1) AS procedure_sk,
+           t.transaction_amount, $now_utc AS dw_gold_created_at, $now_utc AS dw_gold_updated_at
+    FROM silver_claims_transactions_df AS t
+    LEFT JOIN dim_date_by_day AS dt ON dt.date = TRY_CAST(t.transaction_date AS DATE)
+    LEFT JOIN dim_procedure_df AS pc ON pc.procedure_code = t.procedure_code
+    ORDER BY t.__row_id
+""")
 def build_fact_claim_transactions(silver_claims_transactions_df, dim_date_df, dim_procedure_df):
     """Constrói a tabela de fatos de transações de claims."""
     # Garante que as SKs existentes sejam Int64 para aceitar pd.NA antes de usar merge_and_fill_sk
@@ -207,14 +272,68 @@ def build_fact_claim_transactions(silver_claims_transactions_df, dim_date_df, di
      [['transaction_id', 'claim_id', 'patient_sk', 'provider_sk', 'transaction_date_sk', 'procedure_sk', 
        'transaction_amount', 'dw_gold_created_at', 'dw_gold_updated_at']]
 
+@engine_step("""
+    WITH dim_date_by_day AS (SELECT date_sk, TRY_CAST(date_key AS DATE) AS date FROM dim_date_df)
+    SELECT CAST(coalesce(TRY_CAST(k.claim_sk AS BIGINT),
+                         (SELECT coalesce(max(TRY_CAST(claim_sk AS BIGINT)), 0) FROM claim_keys_df)
+                         + row_number() OVER (PARTITION BY k.claim_sk IS NULL ORDER BY f.__row_id)) AS BIGINT) AS claim_sk,
+           f.claim_id, f.patient_sk, f.provider_sk, f.claim_start_date_sk, f.claim_end_date_sk,
+           coalesce(fd.date_sk, -1) AS first_transaction_date_sk, coalesce(ld.date_sk, -1) AS last_transaction_date_sk,
+           CAST(coalesce(TRY_CAST(r.transaction_count AS BIGINT), 0) AS BIGINT) AS transaction_count,
+           coalesce(TRY_CAST(r.total_transaction_amount AS DOUBLE), 0) AS total_transaction_amount,
+           coalesce(TRY_CAST(f.total_outstanding AS DOUBLE), 0) AS total_outstanding,
+           $now_utc AS dw_gold_created_at, $now_utc AS dw_gold_updated_at
+    FROM fact_claims_df AS f
+    LEFT JOIN claim_rollup_df AS r ON r.claim_id = f.claim_id
+    LEFT JOIN claim_keys_df AS k ON k.claim_id = f.claim_id
+    LEFT JOIN dim_date_by_day AS fd ON fd.date = TRY_CAST(r.first_transaction_date AS DATE)
+    LEFT JOIN dim_date_by_day AS ld ON ld.date = TRY_CAST(r.last_transaction_date AS DATE)
+    ORDER BY f.__row_id
+""")
+def build_fact_claim_accumulating(fact_claims_df, claim_rollup_df, dim_date_df, claim_keys_df):
+    """
+    Constrói o snapshot acumulado de claims: uma linha por claim com os totais das transações.
+
+    Args:
+        fact_claims_df (pd.DataFrame): gold_fact_claims.
+        claim_rollup_df (pd.DataFrame): Totais acumulados por claim_id (ver aggregate_claim_transactions).
+        dim_date_df (pd.DataFrame): gold_dim_date, para converter as datas de transação em SKs.
+        claim_keys_df (pd.DataFrame): Pares claim_id/claim_sk já atribuídos, para manter as SKs estáveis.
+    """
+    df = fact_claims_df[['claim_id', 'patient_sk', 'provider_sk', 'claim_start_date_sk', 'claim_end_date_sk', 'total_outstanding']] \
+        .merge(claim_rollup_df, on='claim_id', how='left') \
+        .merge(claim_keys_df[['claim_id', 'claim_sk']], on='claim_id', how='left') \
+        .assign(
+            first_transaction_date_key=lambda df: pd.to_datetime(df['first_transaction_date']).dt.strftime('%Y-%m-%d').fillna('9999-12-31'),
+            last_transaction_date_key=lambda df: pd.to_datetime(df['last_transaction_date']).dt.strftime('%Y-%m-%d').fillna('9999-12-31'),
+            transaction_count=lambda df: df['transaction_count'].fillna(0).astype('Int64'),
+            total_transaction_amount=lambda df: pd.to_numeric(df['total_transaction_amount']).fillna(0),
+            total_outstanding=lambda df: pd.to_numeric(df['total_outstanding']).fillna(0)
+        ).pipe(merge_and_fill_sk, dim_date_df, 'first_transaction_date_key', 'first_transaction_date_sk') \
+         .pipe(merge_and_fill_sk, dim_date_df, 'last_transaction_date_key', 'last_transaction_date_sk')
+
+    # Claims novas recebem SKs após a maior SK já atribuída
+    new_claims = df['claim_sk'].isna()
+    next_sk = int(claim_keys_df['claim_sk'].max()) + 1 if not claim_keys_df.empty else 1
+    df.loc[new_claims, 'claim_sk'] = np.arange(next_sk, next_sk + new_claims.sum())
+    df['claim_sk'] = df['claim_sk'].astype('Int64')
+
+    return df.pipe(add_audit_columns) \
+        [['claim_sk', 'claim_id', 'patient_sk', 'provider_sk', 'claim_start_date_sk', 'claim_end_date_sk',
+          'first_transaction_date_sk', 'last_transaction_date_sk', 'transaction_count', 'total_transaction_amount',
+          'total_outstanding', 'dw_gold_created_at', 'dw_gold_updated_at']]
+
 # -------------------------------
 # Configurações de Schemas para Carregamento
 # -------------------------------
+# "inputs" lista as entradas (tabelas Silver, dimensões Gold ou o intervalo de datas)
+# usadas no fingerprint do checkpoint de cada tabela.
 
 DIMENSION_CONFIGS = {
     "gold_dim_date": {
         "builder": create_dim_date,
         "params": lambda silver_data, min_date, max_date: [min_date, max_date],
+        "inputs": ["date_range"],
         "dtypes": {
             'date_sk': types.BigInteger, 'date_key': types.String(10), 
             'year': types.SmallInteger, 'quarter': types.SmallInteger, 
@@ -228,6 +347,7 @@ DIMENSION_CONFIGS = {
     "gold_dim_patient": {
         "builder": build_dim_patient,
         "params": lambda silver_data, *args: [silver_data["silver_dim_patient"]],
+        "inputs": ["silver_dim_patient"],
         "dtypes": {
             'patient_sk': types.BigInteger, 'patient_natural_key': types.String(50),
             'full_name': types.String(255), 'date_of_birth': types.Date,
@@ -239,6 +359,7 @@ DIMENSION_CONFIGS = {
     "gold_dim_provider": {
         "builder": build_dim_provider,
         "params": lambda silver_data, *args: [silver_data["silver_dim_provider"]],
+        "inputs": ["silver_dim_provider"],
         "dtypes": {
             'provider_sk': types.BigInteger, 'provider_natural_key': types.String(50),
             'provider_name': types.String(255),
@@ -249,6 +370,7 @@ DIMENSION_CONFIGS = {
     "gold_dim_payer": {
         "builder": build_dim_payer,
         "params": lambda silver_data, *args: [silver_data["silver_dim_payer"]],
+        "inputs": ["silver_dim_payer"],
         "dtypes": {
             'payer_sk': types.BigInteger, 'payer_natural_key': types.String(50),
             'payer_name': types.String(255),
@@ -259,6 +381,7 @@ DIMENSION_CONFIGS = {
     "gold_dim_procedure": {
         "builder": build_dim_procedure,
         "params": lambda silver_data, *args: [silver_data["silver_fact_claim_transaction"]],
+        "inputs": ["silver_fact_claim_transaction"],
         "dtypes": {
             'procedure_sk': types.BigInteger, 'procedure_code': types.String(50),
             'procedure_description': types.String(255),
@@ -269,6 +392,7 @@ DIMENSION_CONFIGS = {
     "gold_dim_encounter_type": {
         "builder": build_dim_encounter_type,
         "params": lambda silver_data, *args: [silver_data["silver_fact_encounter"]],
+        "inputs": ["silver_fact_encounter"],
         "dtypes": {
             'encounter_type_sk': types.BigInteger, 'encounter_type': types.String(50),
             'dw_gold_created_at': types.TIMESTAMP(timezone=True),
@@ -281,6 +405,7 @@ FACT_CONFIGS = {
     "gold_fact_claims": {
         "builder": build_fact_claims,
         "params": lambda silver_data, gold_data, *args: [silver_data["silver_fact_claim"], gold_data["gold_dim_date"]],
+        "inputs": ["silver_fact_claim", "gold_dim_date"],
         "dtypes": {
             'claim_id': types.String(50), 'patient_sk': types.BigInteger, 
             'provider_sk': types.BigInteger, 'claim_start_date_sk': types.BigInteger, 
@@ -292,6 +417,7 @@ FACT_CONFIGS = {
     "gold_fact_encounters": {
         "builder": build_fact_encounters,
         "params": lambda silver_data, gold_data, *args: [silver_data["silver_fact_encounter"], gold_data["gold_dim_date"], gold_data["gold_dim_encounter_type"]],
+        "inputs": ["silver_fact_encounter", "gold_dim_date", "gold_dim_encounter_type"],
         "dtypes": {
             'encounter_id': types.String(50), 'patient_sk': types.BigInteger, 
             'provider_sk': types.BigInteger, 'payer_sk': types.BigInteger, 
@@ -306,6 +432,7 @@ FACT_CONFIGS = {
     "gold_fact_claim_transactions": {
         "builder": build_fact_claim_transactions,
         "params": lambda silver_data, gold_data, *args: [silver_data["silver_fact_claim_transaction"], gold_data["gold_dim_date"], gold_data["gold_dim_procedure"]],
+        "inputs": ["silver_fact_claim_transaction", "gold_dim_date", "gold_dim_procedure"],
         "dtypes": {
             'transaction_id': types.String(50), 'claim_id': types.String(50), 
             'patient_sk': types.BigInteger, 'provider_sk': types.BigInteger,
@@ -317,16 +444,99 @@ FACT_CONFIGS = {
     },
 }
 
+# Snapshot acumulado de claims: recalculado a cada execução a partir de gold_fact_claim_transactions.
+# O fato de transações é reconstruído por inteiro a partir da Silver em toda carga, então o rollup
+# por claim é um único GROUP BY sobre ele; apenas as SKs de claim são preservadas entre execuções.
+CLAIM_ACCUMULATING_TABLE = "gold_fact_claim_accumulating"
+# Tabelas de estado das versões que mantinham o rollup incrementalmente (removidas na carga)
+OBSOLETE_CLAIM_STATE_TABLES = ["gold_claim_transaction_rollup", "gold_claim_transaction_ledger",
+                               "gold_claim_transaction_applied"]
+CLAIM_ACCUMULATING_INPUTS = ["gold_fact_claims", "gold_fact_claim_transactions", "gold_dim_date"]
+CLAIM_ACCUMULATING_DTYPES = {
+    'claim_sk': types.BigInteger, 'claim_id': types.String(50),
+    'patient_sk': types.BigInteger, 'provider_sk': types.BigInteger,
+    'claim_start_date_sk': types.BigInteger, 'claim_end_date_sk': types.BigInteger,
+    'first_transaction_date_sk': types.BigInteger, 'last_transaction_date_sk': types.BigInteger,
+    'transaction_count': types.BigInteger, 'total_transaction_amount': types.Numeric(14, 2),
+    'total_outstanding': types.Numeric(10, 2),
+    'dw_gold_created_at': types.TIMESTAMP(timezone=True),
+    'dw_gold_updated_at': types.TIMESTAMP(timezone=True)
+}
+
+# -------------------------------
+# Snapshot Acumulado de Claims
+# -------------------------------
+def aggregate_claim_transactions(engine):
+    """
+    Totaliza gold_fact_claim_transactions por claim no PostgreSQL: contagem, soma e
+    primeira/última data de transação (como DATE, convertida em SK no snapshot).
+
+    É um recálculo completo: cada transação entra uma única vez, na versão carregada
+    na Gold (last-write-wins da Silver), então correções e transações movidas entre
+    claims já se refletem no resultado.
+
+    Returns:
+        pd.DataFrame: Uma linha por claim_id com transações.
+    """
+    with engine.begin() as conn:
+        for table_name in OBSOLETE_CLAIM_STATE_TABLES:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+        return pd.read_sql(text(
+            "SELECT t.claim_id, COUNT(*) AS transaction_count, "
+            "COALESCE(SUM(t.transaction_amount), 0) AS total_transaction_amount, "
+            "MIN(d.date_key::date) AS first_transaction_date, MAX(d.date_key::date) AS last_transaction_date "
+            "FROM gold_fact_claim_transactions t "
+            "LEFT JOIN gold_dim_date d ON d.date_sk = t.transaction_date_sk AND t.transaction_date_sk <> -1 "
+            "GROUP BY t.claim_id"
+        ), conn)
+
+def build_claim_accumulating_snapshot(engine, gold_data, full_refresh=False):
+    """
+    Reconstrói o snapshot acumulado no nível de claim.
+
+    Args:
+        full_refresh (bool): Se True, reatribui as SKs de claim em vez de reaproveitar as do snapshot anterior.
+    """
+    rollup = aggregate_claim_transactions(engine)
+    print(f"    {len(rollup)} claims with transactions aggregated.")
+
+    fact_claims = gold_data.get("gold_fact_claims")
+    if fact_claims is None:
+        fact_claims = pd.read_sql("SELECT * FROM gold_fact_claims", engine)
+    with engine.connect() as conn:
+        snapshot_exists = conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": CLAIM_ACCUMULATING_TABLE}).scalar()
+    claim_keys = pd.read_sql(f"SELECT claim_id, claim_sk FROM {CLAIM_ACCUMULATING_TABLE}", engine) \
+        if snapshot_exists and not full_refresh else pd.DataFrame({'claim_id': pd.Series(dtype=object), 'claim_sk': pd.Series(dtype='Int64')})
+    return build_fact_claim_accumulating(fact_claims, rollup, gold_data["gold_dim_date"], claim_keys)
+
 # -------------------------------
 # Função Principal de Carregamento da Camada Gold
 # -------------------------------
-def load_gold():
-    engine = get_engine()
-    if engine is None: return
+def load_gold(resume=False, engine=None, publish_mart=False, full_refresh=False):
+    """
+    Carrega a camada Gold (Star Schema) a partir da Silver.
+
+    Args:
+        resume (bool): Se True, pula as tabelas já concluídas cujas entradas não mudaram.
+        engine (sqlalchemy.engine.Engine, optional): Conexão a usar; por padrão, a do .env.
+        publish_mart (bool): Se True, publica as tabelas Gold também no mart analítico local (DuckDB/Parquet).
+        full_refresh (bool): Se True, reatribui as SKs do snapshot acumulado de claims.
+
+    Returns:
+        bool: True se a Gold foi carregada (mesmo que a publicação no mart falhe); False caso contrário.
+    """
+    if engine is None:
+        engine = get_engine()
+    if engine is None: return False
 
     silver_data = {}
     gold_data = {}
 
+    try:
+        print(f"DataFrame engine: {get_active_engine().name}")
+    except (ValueError, ImportError) as e:
+        print(f"Error initializing DataFrame engine: {e}"); return False
+
     try:
         print("Reading Silver layer data...")
         # CORREÇÃO ANTERIOR APLICADA: Removido o argumento 'dtype' com tipos SQLAlchemy
@@ -344,7 +554,7 @@ def load_gold():
         
         print("Silver layer extraction complete.")
     except Exception as e:
-        print(f"Error extracting Silver layer data: {e}"); return
+        print(f"Error extracting Silver layer data: {e}"); return False
 
     try:
         print("Calculating date range for date dimension...")
@@ -357,27 +567,66 @@ def load_gold():
         max_date = all_dates.max() if not all_dates.empty else pd.Timestamp.today() + pd.DateOffset(years=1)
         print(f"Date range: {min_date.strftime('%Y-%m-%d')} to {max_date.strftime('%Y-%m-%d')}")
 
+        # Fingerprints das entradas: Silver pelo conteúdo, Gold encadeado a partir das dependências
+        stages = StageRunner(engine, "gold", resume=resume)
+        fingerprints = {name: compute_fingerprint(df) for name, df in silver_data.items()}
+        fingerprints["date_range"] = compute_fingerprint(min_date, max_date)
+
         print("Building Gold layer Dimensions...")
         for table_name, config in DIMENSION_CONFIGS.items():
             print(f"  Building {table_name}...")
-            params = config["params"](silver_data, min_date, max_date)
-            gold_data[table_name] = config["builder"](*params)
+            fingerprints[table_name] = compute_fingerprint(config["builder"], *[fingerprints[name] for name in config["inputs"]])
             # Ao carregar para o banco de dados, usamos os dtypes SQLAlchemy
-            gold_data[table_name].to_sql(table_name, engine, if_exists="replace", index=False, dtype=config["dtypes"])
+            gold_data[table_name] = stages.run(
+                table_name, fingerprints[table_name],
+                lambda config=config: config["builder"](*config["params"](silver_data, min_date, max_date)),
+                dtype=config["dtypes"])
         print("Gold layer Dimensions loaded.")
 
         print("Building Gold layer Fact Tables...")
         for table_name, config in FACT_CONFIGS.items():
             print(f"  Building {table_name}...")
-            params = config["params"](silver_data, gold_data, min_date, max_date)
-            gold_data[table_name] = config["builder"](*params)
-            # Ao carregar para o banco de dados, usamos os dtypes SQLAlchemy
-            gold_data[table_name].to_sql(table_name, engine, if_exists="replace", index=False, dtype=config["dtypes"])
+            fingerprints[table_name] = compute_fingerprint(config["builder"], *[fingerprints[name] for name in config["inputs"]])
+            gold_data[table_name] = stages.run(
+                table_name, fingerprints[table_name],
+                lambda config=config: config["builder"](*config["params"](silver_data, gold_data, min_date, max_date)),
+                dtype=config["dtypes"], read_back=False)
+
+        print(f"  Building {CLAIM_ACCUMULATING_TABLE}...")
+        fingerprints[CLAIM_ACCUMULATING_TABLE] = compute_fingerprint(
+            build_fact_claim_accumulating, aggregate_claim_transactions, full_refresh,
+            *[fingerprints[name] for name in CLAIM_ACCUMULATING_INPUTS])
+        gold_data[CLAIM_ACCUMULATING_TABLE] = stages.run(
+            CLAIM_ACCUMULATING_TABLE, fingerprints[CLAIM_ACCUMULATING_TABLE],
+            lambda: build_claim_accumulating_snapshot(engine, gold_data, full_refresh=full_refresh),
+            dtype=CLAIM_ACCUMULATING_DTYPES, read_back=False)
         print("Gold layer Fact Tables loaded.")
 
+        if stages.skipped:
+            print(f"Stages resumed from checkpoint: {', '.join(stages.skipped)}")
+
+        # Invalida os resultados em cache do QueryService, se alguma tabela foi reconstruída
+        if stages.built:
+            version = bump_gold_version(engine)
+            print(f"Gold layer version bumped to {version}.")
+
         print("\nGold layer loaded successfully (Star Schema built).")
     except Exception as e:
         print(f"Error during Gold layer build or load: {e}")
+        return False
+
+    if publish_mart:
+        try:
+            print("Publishing Gold layer to the analytic mart...")
+            publish_gold_to_mart(gold_data, engine=engine, mart_dir=sample_mart_dir(MART_DIR))
+            print("Analytic mart refreshed.")
+        except Exception as e:
+            print(f"Error publishing Gold layer to the analytic mart: {e}")
+    return True
 
 if __name__ == "__main__":
-    load_gold()
\ No newline at end of file
+    # Use 'python 3_gold_layer_construction.py --resume' para retomar uma execução que falhou
+    # '--publish-mart' para atualizar também o mart analítico local
+    # e '--full-refresh' para reatribuir as SKs do snapshot acumulado de claims
+    load_gold(resume="--resume" in sys.argv, publish_mart="--publish-mart" in sys.argv,
+              full_refresh="--full-refresh" in sys.argv)
\ No newline at end of file
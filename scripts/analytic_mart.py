@@ -0,0 +1,183 @@
+import os
+import shutil
+from datetime import date, datetime
+from decimal import Decimal
+import pandas as pd
+from sqlalchemy import inspect
+from checkpoint import compute_fingerprint
+
+# -------------------------------
+# Variáveis de Configuração
+# -------------------------------
+# Mart analítico local: Parquet particionado + catálogo DuckDB com uma view por tabela Gold
+MART_DIR = "../analytic_mart"
+MART_CATALOG = "gold.duckdb"
+MANIFEST_TABLE = "_mart_partitions"
+
+# Fatos são particionados pelo ano da SK de data principal e ordenados por ela,
+# para que as estatísticas min/max dos row groups do Parquet permitam pular dados
+MART_FACT_PARTITIONS = {
+    "gold_fact_claims": "claim_start_date_sk",
+    "gold_fact_encounters": "encounter_date_sk",
+    "gold_fact_claim_transactions": "transaction_date_sk",
+    "gold_fact_claim_accumulating": "claim_start_date_sk",
+}
+PARTITION_COLUMN = "partition_year"
+UNKNOWN_PARTITION = 9999
+PARQUET_ROW_GROUP_SIZE = 122_880
+
+# Tipos pandas das colunas de uma tabela vazia lida do PostgreSQL, pelo tipo Python da coluna
+# (datas sem hora ficam como TIMESTAMP no Parquet)
+EMPTY_TABLE_DTYPES = {int: "Int64", float: "float64", Decimal: "float64", bool: "boolean",
+                      str: "string", date: "datetime64[us]"}
+
+# -------------------------------
+# Funções Auxiliares
+# -------------------------------
+def _connect(mart_dir, read_only=False):
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("O mart analítico requer o pacote 'duckdb' (pip install duckdb).") from e
+    os.makedirs(mart_dir, exist_ok=True)
+    return duckdb.connect(os.path.join(mart_dir, MART_CATALOG), read_only=read_only)
+
+def _ensure_manifest(conn):
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} ("
+        "table_name VARCHAR, partition_value VARCHAR, fingerprint VARCHAR, row_count BIGINT, "
+        "written_at TIMESTAMP DEFAULT current_timestamp, PRIMARY KEY (table_name, partition_value))"
+    )
+
+def _write_parquet(conn, df, path, sort_col):
+    """Grava o DataFrame em Parquet (ZSTD) ordenado por sort_col, substituindo o arquivo de forma atômica."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    conn.register("partition_df", df)
+    try:
+        conn.execute(
+            f"COPY (SELECT * FROM partition_df ORDER BY \"{sort_col}\") TO '{tmp_path}' "
+            f"(FORMAT PARQUET, COMPRESSION ZSTD, ROW_GROUP_SIZE {PARQUET_ROW_GROUP_SIZE})"
+        )
+    finally:
+        conn.unregister("partition_df")
+    os.replace(tmp_path, path)
+
+def _read_table(engine, table_name):
+    """
+    Lê uma tabela Gold do PostgreSQL. Sem linhas, o pandas não infere os tipos (todas as
+    colunas ficam object e viram INTEGER no Parquet); eles são obtidos do catálogo.
+    """
+    df = pd.read_sql(f"SELECT * FROM {table_name}", engine)
+    if not df.empty:
+        return df
+    dtypes = {}
+    for column in inspect(engine).get_columns(table_name):
+        try:
+            python_type = column["type"].python_type
+        except NotImplementedError:
+            continue
+        if python_type is datetime:
+            dtypes[column["name"]] = "datetime64[us, UTC]" if getattr(column["type"], "timezone", False) else "datetime64[us]"
+        elif python_type in EMPTY_TABLE_DTYPES:
+            dtypes[column["name"]] = EMPTY_TABLE_DTYPES[python_type]
+    return df.astype(dtypes)
+
+def _partitions(table_name, df, dim_date_df):
+    """
+    Divide a tabela em partições: por ano da SK de data para fatos, partição única para dimensões.
+    Um fato sem linhas fica com uma única partição vazia (UNKNOWN_PARTITION).
+    """
+    if table_name not in MART_FACT_PARTITIONS:
+        return {"all": df}
+    if df.empty:
+        # Sem linhas, mantém uma partição vazia com o schema da tabela: a view do fato
+        # precisa de ao menos um arquivo Parquet, e as partições anteriores são removidas
+        return {str(UNKNOWN_PARTITION): df}
+    date_sk_col = MART_FACT_PARTITIONS[table_name]
+    years = df[date_sk_col].map(dim_date_df.set_index('date_sk')['year']).fillna(UNKNOWN_PARTITION).astype(int)
+    return {str(year): part for year, part in df.groupby(years.to_numpy(), sort=True)}
+
+# -------------------------------
+# Publicação da Camada Gold no Mart
+# -------------------------------
+def publish_gold_to_mart(gold_data, engine=None, mart_dir=MART_DIR):
+    """
+    Publica as dimensões e fatos Gold no mart analítico local, de forma incremental.
+
+    Apenas partições cujo conteúdo mudou (fingerprint sem as colunas de auditoria) são
+    reescritas; partições que deixaram de existir são removidas. As views do catálogo
+    DuckDB expõem cada tabela com o mesmo nome da Gold, de modo que as consultas Gold
+    de insights.sql rodam sem alterações sobre o mart.
+
+    Args:
+        gold_data (dict): Nome da tabela Gold -> DataFrame (None para tabelas não carregadas em memória).
+        engine (sqlalchemy.engine.Engine, optional): Usado para ler do PostgreSQL as tabelas ausentes.
+
+    Returns:
+        dict: Nome da tabela -> número de partições reescritas.
+    """
+    mart_dir = os.path.abspath(mart_dir)
+    tables = {}
+    for table_name, df in gold_data.items():
+        if df is None:
+            if engine is None:
+                raise ValueError(f"Tabela {table_name} não está em memória e nenhum engine foi informado.")
+            df = _read_table(engine, table_name)
+        tables[table_name] = df
+
+    written = {}
+    conn = _connect(mart_dir)
+    try:
+        _ensure_manifest(conn)
+        for table_name, df in tables.items():
+            table_dir = os.path.join(mart_dir, table_name)
+            sort_col = MART_FACT_PARTITIONS.get(table_name, df.columns[0])
+            previous = dict(conn.execute(
+                f"SELECT partition_value, fingerprint FROM {MANIFEST_TABLE} WHERE table_name = ?", [table_name]).fetchall())
+
+            partitions = _partitions(table_name, df, tables["gold_dim_date"])
+            written[table_name] = 0
+            for value, part in partitions.items():
+                fingerprint = compute_fingerprint(part.sort_values(sort_col, kind="stable"))
+                if previous.get(value) == fingerprint:
+                    continue
+                subdir = table_dir if value == "all" else os.path.join(table_dir, f"{PARTITION_COLUMN}={value}")
+                _write_parquet(conn, part, os.path.join(subdir, "data.parquet"), sort_col)
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {MANIFEST_TABLE} (table_name, partition_value, fingerprint, row_count) "
+                    "VALUES (?, ?, ?, ?)", [table_name, value, fingerprint, len(part)])
+                written[table_name] += 1
+
+            for value in set(previous) - set(partitions):
+                shutil.rmtree(os.path.join(table_dir, f"{PARTITION_COLUMN}={value}"), ignore_errors=True)
+                conn.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE table_name = ? AND partition_value = ?", [table_name, value])
+
+            source = (f"read_parquet('{table_dir}/*/data.parquet', hive_partitioning = true)"
+                      if table_name in MART_FACT_PARTITIONS else f"read_parquet('{table_dir}/data.parquet')")
+            conn.execute(f"CREATE OR REPLACE VIEW {table_name} AS SELECT * FROM {source}")
+            print(f"  Mart: {table_name} ({written[table_name]}/{len(partitions)} partições reescritas)")
+    finally:
+        conn.close()
+    return written
+
+def connect_mart(mart_dir=MART_DIR):
+    """Abre o catálogo DuckDB do mart em modo somente leitura, para consultas analíticas."""
+    return _connect(os.path.abspath(mart_dir), read_only=True)
+
+if __name__ == "__main__":
+    # Atualiza o mart a partir das tabelas Gold já carregadas no PostgreSQL
+    from layers import load_layer
+    from sampling import sample_mart_dir
+
+    gold = load_layer("gold")
+    engine = gold.get_engine()
+    if engine is None:
+        print("Não foi possível conectar ao banco de dados.")
+    else:
+        try:
+            tables = [*gold.DIMENSION_CONFIGS, *gold.FACT_CONFIGS, gold.CLAIM_ACCUMULATING_TABLE]
+            publish_gold_to_mart({name: None for name in tables}, engine=engine, mart_dir=sample_mart_dir(MART_DIR))
+            print("Mart analítico atualizado.")
+        except Exception as e:
+            print(f"Erro ao publicar a camada Gold no mart analítico: {e}")
@@ -0,0 +1,133 @@
+import sys
+import time
+import pandas as pd
+from engines import ENGINES, use_engine
+from layers import load_layer
+from synthetic_data import generate_bronze_frames
+
+# -------------------------------
+# Variáveis de Configuração
+# -------------------------------
+# Escalas (número de pacientes) e repetições usadas no benchmark
+BENCHMARK_SCALES = [1_000, 10_000, 50_000]
+BENCHMARK_REPEATS = 3
+
+# Colunas de auditoria dependem do horário da execução e não entram na comparação
+AUDIT_COLUMNS = ['dw_created_at', 'dw_updated_at', 'dw_gold_created_at', 'dw_gold_updated_at']
+
+# -------------------------------
+# Execução das Transformações
+# -------------------------------
+def run_transforms(bronze):
+    """
+    Executa as transformações Silver e as construções Gold (sem carga no banco)
+    com a engine ativa, reproduzindo a ordem de load_silver() e load_gold().
+
+    Returns:
+        dict: Nome da tabela -> pd.DataFrame resultante.
+    """
+    silver, gold = load_layer("silver"), load_layer("gold")
+    out = {}
+    out["silver_dim_patient"] = silver.transform_patients_to_silver(bronze["bronze_patients"])
+    out["silver_dim_payer"] = silver.transform_payers_to_silver(bronze["bronze_payers"])
+    out["silver_dim_provider"] = silver.transform_providers_to_silver(bronze["bronze_claims"], bronze["bronze_encounters"])
+    out["silver_fact_claim"] = silver.transform_claims_to_silver(
+        bronze["bronze_claims"], out["silver_dim_patient"], out["silver_dim_provider"])
+    out["silver_fact_claim_transaction"] = silver.transform_claims_transactions_to_silver(
+        bronze["bronze_claims_transactions"], out["silver_dim_patient"], out["silver_dim_provider"], out["silver_fact_claim"])
+    out["silver_fact_encounter"] = silver.transform_encounters_to_silver(
+        bronze["bronze_encounters"], out["silver_dim_patient"], out["silver_dim_provider"], out["silver_dim_payer"])
+
+    # Os builders da Gold alteram os DataFrames recebidos; trabalha sobre cópias
+    silver_data = {name: df.copy() for name, df in out.items()}
+    min_date, max_date = pd.Timestamp('2020-01-01'), pd.Timestamp('2025-12-31')
+    for table_name, config in gold.DIMENSION_CONFIGS.items():
+        out[table_name] = config["builder"](*config["params"](silver_data, min_date, max_date))
+    for table_name, config in gold.FACT_CONFIGS.items():
+        out[table_name] = config["builder"](*config["params"](silver_data, out, min_date, max_date))
+    return out
+
+def assert_equivalent(expected, actual, engine_name):
+    """
+    Garante que a engine produziu as mesmas tabelas que a engine pandas: mesmas colunas,
+    na mesma ordem, com o mesmo tipo de dado (inteiro, real, data, texto...) e os mesmos valores.
+    Diferenças de representação (int64 vs. Int64, resolução das datas) são aceitas, assim como
+    SKs sem correspondência na junção: o pandas as converte para float64 (NaN), a engine
+    mantém Int64 (<NA>).
+    """
+    for table_name, expected_df in expected.items():
+        actual_df = actual[table_name]
+        if list(actual_df.columns) != list(expected_df.columns):
+            raise AssertionError(f"Engine {engine_name} divergiu da engine pandas em {table_name}: "
+                                 f"colunas {list(actual_df.columns)} != {list(expected_df.columns)}")
+        cols = [c for c in expected_df.columns if c not in AUDIT_COLUMNS]
+        actual_df = actual_df[cols].reset_index(drop=True)
+        for col in cols:
+            expected_dtype, actual_dtype = expected_df[col].dtype, actual_df[col].dtype
+            nullable_int = (expected_dtype.kind == 'f' and isinstance(actual_dtype, pd.Int64Dtype)
+                            and expected_df[col].isna().any())
+            if expected_dtype.kind != actual_dtype.kind and not nullable_int:
+                raise AssertionError(f"Engine {engine_name} divergiu da engine pandas em {table_name}.{col}: "
+                                     f"tipo {actual_dtype} != {expected_dtype}")
+            if expected_dtype != actual_dtype:
+                actual_df[col] = actual_df[col].astype(expected_dtype)
+        try:
+            pd.testing.assert_frame_equal(expected_df[cols].reset_index(drop=True), actual_df,
+                                          check_dtype=False, check_exact=False)
+        except AssertionError as e:
+            raise AssertionError(f"Engine {engine_name} divergiu da engine pandas em {table_name}: {e}") from e
+
+# -------------------------------
+# Benchmark pandas vs. engines embarcadas
+# -------------------------------
+def run_benchmark(engine_names, scales=BENCHMARK_SCALES, repeats=BENCHMARK_REPEATS):
+    """
+    Mede o tempo das transformações em cada engine e verifica a equivalência dos resultados.
+
+    Returns:
+        pd.DataFrame: Uma linha por (escala, engine) com o melhor tempo e o speedup sobre pandas.
+    """
+    rows = []
+    for scale in scales:
+        print(f"\nEscala: {scale} pacientes")
+        bronze = generate_bronze_frames(n_patients=scale)
+        baseline = None
+        for engine_name in ['pandas'] + [name for name in engine_names if name != 'pandas']:
+            try:
+                use_engine(engine_name)
+            except ImportError as e:
+                print(f"  Engine {engine_name} indisponível ({e}), ignorando.")
+                continue
+
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                result = run_transforms(bronze)
+                timings.append(time.perf_counter() - start)
+
+            if baseline is None:
+                baseline = result
+            else:
+                assert_equivalent(baseline, result, engine_name)
+
+            best = min(timings)
+            rows.append({"scale": scale, "engine": engine_name, "best_seconds": best})
+            print(f"  {engine_name:<8} melhor tempo: {best:.3f}s (resultados equivalentes à engine pandas)")
+
+    report = pd.DataFrame(rows)
+    pandas_times = report[report['engine'] == 'pandas'].set_index('scale')['best_seconds']
+    report['speedup_vs_pandas'] = report['scale'].map(pandas_times) / report['best_seconds']
+    slower = report[(report['engine'] != 'pandas') & (report['speedup_vs_pandas'] < 1)]
+    for _, row in slower.iterrows():
+        print(f"  Aviso: {row['engine']} é {1 / row['speedup_vs_pandas']:.1f}x mais lenta que pandas "
+              f"na escala {row['scale']}; mantenha DF_ENGINE=pandas para cargas reais.")
+    return report
+
+if __name__ == "__main__":
+    # Ex.: python benchmark_engines.py duckdb
+    engine_names = sys.argv[1:] or [name for name in ENGINES if name != 'pandas']
+    try:
+        print(run_benchmark(engine_names).to_string(index=False))
+    except AssertionError as e:
+        print(f"Falha na verificação de equivalência: {e}")
+        sys.exit(1)
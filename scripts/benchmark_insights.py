@@ -0,0 +1,236 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from layers import load_layer
+from query_service import read_insight_queries
+from synthetic_data import generate_bronze_frames
+
+# -------------------------------
+# Variáveis de Configuração
+# -------------------------------
+INSIGHTS_SQL_PATH = "../oltp_queries/insights.sql"
+REPORTS_DIR = "../benchmark_reports"
+
+# Escalas (número de pacientes) e execuções cronometradas por consulta
+DEFAULT_SCALES = [1_000, 10_000, 100_000]
+DEFAULT_REPEATS = 5
+
+# Uma consulta é considerada regressão se ficar mais lenta que a baseline por este fator
+REGRESSION_THRESHOLD = 1.2
+
+# Cada escala é carregada em seu próprio schema, isolado das tabelas reais
+SCHEMA_PREFIX = "bench_scale_"
+
+# -------------------------------
+# Funções de Conexão
+# -------------------------------
+def get_engine(search_path=None):
+    """Engine da camada Silver (mesma configuração do .env), opcionalmente restrito a um schema."""
+    return load_layer("silver").get_engine(search_path=search_path)
+
+# -------------------------------
+# Leitura das Consultas de insights.sql
+# -------------------------------
+def read_insight_pairs(path=INSIGHTS_SQL_PATH):
+    """
+    Agrupa as consultas de insights.sql (lidas por query_service.read_insight_queries, sem o
+    prefixo EXPLAIN ANALYSE) em pares Gold/Silver.
+
+    Cada insight traz a consulta Gold seguida da Silver; a camada é identificada pelas
+    tabelas consultadas, e o título pelo cabeçalho "INSIGHT N: título" do arquivo.
+
+    Returns:
+        list: Dicionários com 'insight', 'title', 'gold' e 'silver'.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        titles = {int(n): title.strip() for n, title in re.findall(r"--\s*INSIGHT\s+(\d+):\s*(.+)", f.read())}
+
+    pairs = []
+    for sql in read_insight_queries(path):
+        if re.search(r"\bgold_", sql):
+            insight = len(pairs) + 1
+            pairs.append({"insight": insight, "title": titles.get(insight, ""), "gold": sql})
+        elif pairs:
+            pairs[-1]["silver"] = sql
+    return [pair for pair in pairs if "silver" in pair]
+
+# -------------------------------
+# Preparação dos Dados por Escala
+# -------------------------------
+def prepare_scale(scale):
+    """
+    Gera os dados Bronze da escala em um schema próprio e executa as cargas Silver e Gold nele.
+
+    Returns:
+        sqlalchemy.engine.Engine: Engine apontando (via search_path) para o schema da escala,
+        ou None se a conexão ou as cargas falharem.
+    """
+    schema = f"{SCHEMA_PREFIX}{scale}"
+    admin_engine = get_engine()
+    if admin_engine is None:
+        return None
+    with admin_engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+
+    engine = get_engine(search_path=schema)
+    print(f"Gerando dados Bronze para {scale} pacientes no schema {schema}...")
+    for table_name, df in generate_bronze_frames(n_patients=scale).items():
+        df.to_sql(table_name, engine, if_exists="replace", index=False, chunksize=10_000, method="multi")
+
+    # As cargas imprimem e absorvem os próprios erros: sem o retorno, a escala seria medida
+    # sobre tabelas ausentes ou de uma execução anterior
+    if not load_layer("silver").load_silver(engine=engine) or not load_layer("gold").load_gold(engine=engine):
+        print(f"Falha na carga das camadas Silver/Gold no schema {schema}.")
+        return None
+
+    # Atualiza as estatísticas do planner antes de medir
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    return engine
+
+# -------------------------------
+# Medição das Consultas
+# -------------------------------
+def time_query(engine, sql, repeats):
+    """Executa a consulta uma vez para aquecer o cache e depois 'repeats' vezes, retornando os tempos em ms."""
+    timings = []
+    with engine.connect() as conn:
+        conn.execute(text(sql)).fetchall()
+        for _ in range(repeats):
+            start = time.perf_counter()
+            conn.execute(text(sql)).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def explain_query(engine, sql):
+    """Retorna o plano de EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) e um resumo dos buffers."""
+    with engine.connect() as conn:
+        plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]
+    summary = {
+        "execution_ms": root.get("Execution Time"),
+        "planning_ms": root.get("Planning Time"),
+        "shared_hit_blocks": root["Plan"].get("Shared Hit Blocks"),
+        "shared_read_blocks": root["Plan"].get("Shared Read Blocks"),
+    }
+    return plan, summary
+
+def run_benchmark(scales=DEFAULT_SCALES, repeats=DEFAULT_REPEATS, reload=True):
+    """
+    Executa cada par Gold/Silver de insights.sql em todas as escalas.
+
+    Returns:
+        list: Um resultado por (escala, insight, camada) com tempos, resumo e plano,
+        ou com a mensagem de erro ('error') se a consulta falhou.
+    """
+    pairs = read_insight_pairs()
+    results = []
+    for scale in scales:
+        engine = prepare_scale(scale) if reload else get_engine(search_path=f"{SCHEMA_PREFIX}{scale}")
+        if engine is None:
+            print(f"Não foi possível preparar a escala {scale}; escala ignorada.")
+            continue
+        for pair in pairs:
+            for layer in ("gold", "silver"):
+                try:
+                    timings = time_query(engine, pair[layer], repeats)
+                    plan, summary = explain_query(engine, pair[layer])
+                except SQLAlchemyError as e:
+                    # Registrada no relatório e contada como falha no código de saída
+                    error = str(getattr(e, "orig", None) or e).strip().splitlines()[0]
+                    print(f"  Erro no insight {pair['insight']} ({layer}) na escala {scale}: {error}")
+                    results.append({"scale": scale, "insight": pair["insight"], "title": pair["title"],
+                                    "layer": layer, "error": error})
+                    continue
+                results.append({
+                    "scale": scale, "insight": pair["insight"], "title": pair["title"], "layer": layer,
+                    "median_ms": statistics.median(timings), "min_ms": min(timings), "max_ms": max(timings),
+                    **summary, "plan": plan,
+                })
+                print(f"  Escala {scale} | Insight {pair['insight']} | {layer:<6} | mediana {statistics.median(timings):.2f} ms")
+    return results
+
+# -------------------------------
+# Relatório
+# -------------------------------
+def find_regressions(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Compara as medianas com as de um relatório anterior e retorna as consultas que pioraram."""
+    previous = {(r["scale"], r["insight"], r["layer"]): r["median_ms"] for r in baseline if "error" not in r}
+    regressions = []
+    for r in results:
+        if "error" in r:
+            continue
+        before = previous.get((r["scale"], r["insight"], r["layer"]))
+        if before and r["median_ms"] > before * threshold:
+            regressions.append({**r, "baseline_ms": before, "ratio": r["median_ms"] / before})
+    return regressions
+
+def write_report(results, regressions, reports_dir=REPORTS_DIR):
+    """Grava o relatório em JSON (com os planos) e em Markdown (comparação Gold vs. Silver e consultas com erro)."""
+    os.makedirs(reports_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    json_path = os.path.join(reports_dir, f"insights_benchmark_{stamp}.json")
+    md_path = os.path.join(reports_dir, f"insights_benchmark_{stamp}.md")
+
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+
+    by_key = {(r["scale"], r["insight"], r["layer"]): r for r in results}
+    lines = ["# Benchmark insights.sql: Gold vs. Silver", "",
+             "| Escala | Insight | Gold mediana (ms) | Silver mediana (ms) | Silver/Gold | Gold buffers (hit/read) | Silver buffers (hit/read) |",
+             "|---|---|---|---|---|---|---|"]
+    pairs = sorted({(r["scale"], r["insight"]): r["title"] for r in results}.items())
+    for (scale, insight), title in pairs:
+        gold, silver = by_key.get((scale, insight, "gold")), by_key.get((scale, insight, "silver"))
+        # Consultas com erro (ou ausentes) aparecem como "erro", sem razão Silver/Gold
+        cells = ["erro" if r is None or "error" in r else f"{r['median_ms']:.2f}" for r in (gold, silver)]
+        ratio = f"{silver['median_ms'] / gold['median_ms']:.2f}x" if "erro" not in cells else "-"
+        buffers = ["-" if r is None or "error" in r else f"{r['shared_hit_blocks']}/{r['shared_read_blocks']}"
+                   for r in (gold, silver)]
+        lines.append(f"| {scale} | {insight}. {title} | {cells[0]} | {cells[1]} | {ratio} | {buffers[0]} | {buffers[1]} |")
+    failures = [r for r in results if "error" in r]
+    if failures:
+        lines += ["", "## Consultas com erro", "", "| Escala | Insight | Camada | Erro |", "|---|---|---|---|"]
+        for r in failures:
+            error = r["error"].replace("|", "\\|")
+            lines.append(f"| {r['scale']} | {r['insight']} | {r['layer']} | {error} |")
+    if regressions:
+        lines += ["", "## Regressões em relação à baseline", "",
+                  "| Escala | Insight | Camada | Baseline (ms) | Atual (ms) | Fator |", "|---|---|---|---|---|---|"]
+        lines += [f"| {r['scale']} | {r['insight']} | {r['layer']} | {r['baseline_ms']:.2f} | {r['median_ms']:.2f} | {r['ratio']:.2f}x |"
+                  for r in regressions]
+    with open(md_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return json_path, md_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das consultas Gold vs. Silver de insights.sql.")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="Número de pacientes por escala.")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Execuções cronometradas por consulta.")
+    parser.add_argument("--no-reload", action="store_true", help="Reutiliza os schemas já carregados de cada escala.")
+    parser.add_argument("--baseline", help="Relatório JSON anterior para detectar regressões.")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.scales, args.repeats, reload=not args.no_reload)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f))
+    json_path, md_path = write_report(results, regressions)
+    print(f"\nRelatório gravado em {md_path} (planos completos em {json_path}).")
+    failures = [r for r in results if "error" in r]
+    if failures:
+        print(f"{len(failures)} consulta(s) falharam.")
+    if regressions:
+        print(f"{len(regressions)} consulta(s) mais lenta(s) que a baseline por mais de {REGRESSION_THRESHOLD}x.")
+    if failures or regressions:
+        sys.exit(1)
@@ -0,0 +1,153 @@
+import os
+import glob
+import hashlib
+import inspect
+import functools
+import pandas as pd
+from sqlalchemy import text
+
+# -------------------------------
+# Variáveis de Configuração
+# -------------------------------
+# Tabela de estado das execuções: uma linha por (camada, tabela) concluída
+RUN_STATE_TABLE = "pipeline_run_state"
+
+# Colunas de auditoria mudam a cada execução e não representam mudança nos dados
+AUDIT_COLUMN_PREFIX = "dw_"
+
+# Fontes cujo conteúdo compõe a versão do código do pipeline (ver pipeline_code_version)
+PIPELINE_SOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py")
+
+# -------------------------------
+# Fingerprint das Entradas
+# -------------------------------
+def compute_fingerprint(*parts):
+    """
+    Calcula um fingerprint determinístico para as entradas de uma etapa.
+
+    Aceita DataFrames (conteúdo e ordem das linhas, sem as colunas de auditoria),
+    funções (código-fonte, para que mudanças na lógica invalidem o checkpoint)
+    e valores simples (ex.: outros fingerprints ou o intervalo de datas).
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, pd.DataFrame):
+            cols = [c for c in part.columns if not str(c).startswith(AUDIT_COLUMN_PREFIX)]
+            digest.update(repr(cols).encode("utf-8"))
+            digest.update(pd.util.hash_pandas_object(part[cols], index=False).values.tobytes())
+        elif callable(part):
+            digest.update(inspect.getsource(part).encode("utf-8"))
+        else:
+            digest.update(repr(part).encode("utf-8"))
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def pipeline_code_version():
+    """
+    Hash do código-fonte de todos os scripts do pipeline.
+
+    O fingerprint de uma função cobre apenas o seu próprio código; funções auxiliares
+    (merge_and_fill_sk, calculate_age, engines...) mudam o resultado sem mudar esse
+    fingerprint. Qualquer alteração nos scripts invalida, portanto, todos os checkpoints.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(PIPELINE_SOURCES)):
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# -------------------------------
+# Tabela de Estado das Execuções
+# -------------------------------
+def ensure_run_state_table(engine):
+    """Cria a tabela de estado das execuções, se ainda não existir."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {RUN_STATE_TABLE} ("
+            "layer VARCHAR(20) NOT NULL, table_name VARCHAR(100) NOT NULL, "
+            "input_fingerprint CHAR(64) NOT NULL, row_count BIGINT, "
+            "completed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(), "
+            "PRIMARY KEY (layer, table_name))"
+        ))
+
+def get_stage_fingerprint(engine, layer, table_name):
+    """Retorna o fingerprint registrado na última conclusão da etapa, ou None."""
+    with engine.connect() as conn:
+        return conn.execute(text(
+            f"SELECT input_fingerprint FROM {RUN_STATE_TABLE} WHERE layer = :layer AND table_name = :table_name"
+        ), {"layer": layer, "table_name": table_name}).scalar()
+
+def clear_stage(engine, layer, table_name):
+    """Remove o registro de conclusão da etapa (antes de reconstruí-la)."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"DELETE FROM {RUN_STATE_TABLE} WHERE layer = :layer AND table_name = :table_name"
+        ), {"layer": layer, "table_name": table_name})
+
+def mark_stage_complete(engine, layer, table_name, fingerprint, row_count):
+    """Registra a conclusão da etapa com o fingerprint de suas entradas."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"INSERT INTO {RUN_STATE_TABLE} (layer, table_name, input_fingerprint, row_count) "
+            "VALUES (:layer, :table_name, :fingerprint, :row_count) "
+            "ON CONFLICT (layer, table_name) DO UPDATE SET input_fingerprint = EXCLUDED.input_fingerprint, "
+            "row_count = EXCLUDED.row_count, completed_at = now()"
+        ), {"layer": layer, "table_name": table_name, "fingerprint": fingerprint, "row_count": int(row_count)})
+
+def _table_exists(engine, table_name):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": table_name}).scalar()
+
+# -------------------------------
+# Execução de Etapas com Checkpoint
+# -------------------------------
+class StageRunner:
+    """
+    Executa as etapas (uma por tabela) de uma camada, registrando cada conclusão.
+
+    Em modo resume, etapas já concluídas cujo fingerprint de entrada não mudou são
+    puladas, e seu resultado é lido de volta do banco quando as etapas seguintes precisam dele.
+    O fingerprint registrado inclui a versão do código do pipeline.
+    """
+
+    def __init__(self, engine, layer, resume=False):
+        self.engine = engine
+        self.layer = layer
+        self.resume = resume
+        self.built = []
+        self.skipped = []
+        ensure_run_state_table(engine)
+
+    def run(self, table_name, fingerprint, build, dtype=None, read_back=True):
+        """
+        Constrói e carrega a tabela, ou a pula se o checkpoint ainda for válido.
+
+        Args:
+            table_name (str): Tabela de destino no PostgreSQL.
+            fingerprint (str): Fingerprint das entradas da etapa (ver compute_fingerprint).
+            build (callable): Função sem argumentos que retorna o DataFrame da tabela.
+            dtype (dict, optional): Tipos SQLAlchemy repassados ao to_sql.
+            read_back (bool): Se a etapa for pulada, lê a tabela do banco para as etapas seguintes.
+
+        Returns:
+            pd.DataFrame: O DataFrame construído, o lido do banco, ou None se pulado sem read_back.
+        """
+        fingerprint = compute_fingerprint(fingerprint, pipeline_code_version())
+        if self.resume and get_stage_fingerprint(self.engine, self.layer, table_name) == fingerprint \
+                and _table_exists(self.engine, table_name):
+            print(f"  Checkpoint válido, pulando {table_name}.")
+            self.skipped.append(table_name)
+            return pd.read_sql(f"SELECT * FROM {table_name}", self.engine) if read_back else None
+
+        # Remove o registro antes da carga: uma falha no meio do to_sql não pode deixar um checkpoint válido
+        clear_stage(self.engine, self.layer, table_name)
+        try:
+            df = build()
+            df.to_sql(table_name, self.engine, if_exists="replace", index=False, dtype=dtype)
+        except Exception:
+            print(f"  Etapa {table_name} falhou. Execute novamente com --resume para retomar a partir dela.")
+            raise
+        mark_stage_complete(self.engine, self.layer, table_name, fingerprint, len(df))
+        self.built.append(table_name)
+        return df
@@ -0,0 +1,208 @@
+import os
+import math
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+
+# -------------------------------
+# Variáveis de Configuração
+# -------------------------------
+DEDUP_CHUNK_SIZE = 100_000
+BLOOM_FALSE_POSITIVE_RATE = 0.01
+
+# Colunas que definem a ordem de chegada no "last-write-wins": data de carga e chave de carga
+# (sequência), que desempata linhas da mesma carga. Ver oltp_queries/create_table.sql.
+LOAD_TIME_COLUMN = "loaded_at"
+LOAD_ID_COLUMN = "load_id"
+MIGRATION_HINT = "python 1_bronze_layer_construction.py --migrate"
+
+# Chaves de hash (16 caracteres cada) combinadas em um hash de 128 bits por chave natural
+_HASH_KEY_1 = "medallion-dedup1"
+_HASH_KEY_2 = "medallion-dedup2"
+
+# -------------------------------
+# Funções Auxiliares
+# -------------------------------
+def hash_natural_keys(df, key_cols):
+    """
+    Calcula um hash de 128 bits (dois uint64) para a chave natural de cada linha.
+
+    Returns:
+        tuple: (h1, h2) arrays numpy de uint64.
+    """
+    keys = df[key_cols]
+    h1 = pd.util.hash_pandas_object(keys, index=False, hash_key=_HASH_KEY_1).to_numpy()
+    h2 = pd.util.hash_pandas_object(keys, index=False, hash_key=_HASH_KEY_2).to_numpy()
+    return h1, h2
+
+class BloomFilter:
+    """
+    Filtro de Bloom em memória sobre os hashes das chaves.
+
+    Uma resposta negativa é definitiva (chave nunca vista), o que evita consultar o
+    conjunto em disco para a grande maioria das chaves novas.
+    """
+
+    def __init__(self, expected_items, false_positive_rate=BLOOM_FALSE_POSITIVE_RATE):
+        expected_items = max(int(expected_items), 1)
+        self.n_bits = max(int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)), 64)
+        self.n_hashes = max(int(round(self.n_bits / expected_items * math.log(2))), 1)
+        self._bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, h1, h2):
+        # Double hashing: posição_i = h1 + i * h2 (mod n_bits)
+        n_bits = np.uint64(self.n_bits)
+        for i in range(self.n_hashes):
+            yield (h1 + np.uint64(i) * h2) % n_bits
+
+    def add(self, h1, h2):
+        for pos in self._positions(h1, h2):
+            np.bitwise_or.at(self._bits, pos >> np.uint64(3), (1 << (pos & np.uint64(7))).astype(np.uint8))
+
+    def might_contain(self, h1, h2):
+        result = np.ones(len(h1), dtype=bool)
+        for pos in self._positions(h1, h2):
+            result &= (self._bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1 == 1
+        return result
+
+class DiskKeySet:
+    """Conjunto de hashes de chaves persistido em SQLite, para volumes que não cabem em memória."""
+
+    def __init__(self, directory=None):
+        self._dir = tempfile.mkdtemp(prefix="dedup_", dir=directory)
+        self._conn = sqlite3.connect(os.path.join(self._dir, "keys.db"))
+        self._conn.execute("PRAGMA journal_mode = OFF")
+        self._conn.execute("PRAGMA synchronous = OFF")
+        self._conn.execute("CREATE TABLE seen (h1 INTEGER NOT NULL, h2 INTEGER NOT NULL, PRIMARY KEY (h1, h2)) WITHOUT ROWID")
+
+    @staticmethod
+    def _rows(h1, h2):
+        # SQLite armazena inteiros com sinal de 64 bits
+        return zip(h1.view(np.int64).tolist(), h2.view(np.int64).tolist())
+
+    def contains(self, h1, h2):
+        if len(h1) == 0:
+            return np.zeros(0, dtype=bool)
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS probe (h1 INTEGER, h2 INTEGER)")
+        self._conn.execute("DELETE FROM probe")
+        self._conn.executemany("INSERT INTO probe VALUES (?, ?)", self._rows(h1, h2))
+        found = set(self._conn.execute("SELECT s.h1, s.h2 FROM probe p JOIN seen s ON s.h1 = p.h1 AND s.h2 = p.h2"))
+        return np.array([row in found for row in self._rows(h1, h2)], dtype=bool)
+
+    def add(self, h1, h2):
+        self._conn.executemany("INSERT OR IGNORE INTO seen VALUES (?, ?)", self._rows(h1, h2))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+        os.remove(os.path.join(self._dir, "keys.db"))
+        os.rmdir(self._dir)
+
+# -------------------------------
+# Deduplicação em Streaming
+# -------------------------------
+def deduplicate_chunks(chunks, key_cols, expected_items, stats, directory=None):
+    """
+    Remove linhas com chave natural repetida de um fluxo de chunks, mantendo a primeira ocorrência.
+
+    Para obter "last-write-wins", os chunks devem chegar da carga mais recente para a mais antiga.
+    O estado da deduplicação é limitado ao filtro de Bloom; o conjunto completo de chaves fica
+    em disco (SQLite) e só é consultado para possíveis repetições. Cada chunk é entregue assim
+    que processado: a memória total depende de quanto o consumidor acumula.
+
+    Args:
+        chunks (iterable): DataFrames na ordem de prioridade (mais recente primeiro).
+        key_cols (list): Colunas da chave natural.
+        expected_items (int): Estimativa do número de linhas, para dimensionar o filtro de Bloom.
+        stats (dict): Preenchido com 'rows_read' e 'duplicates_dropped'.
+
+    Yields:
+        pd.DataFrame: Cada chunk sem as linhas repetidas.
+    """
+    stats.update(rows_read=0, duplicates_dropped=0)
+    bloom = BloomFilter(expected_items)
+    seen = DiskKeySet(directory)
+    try:
+        for chunk in chunks:
+            stats["rows_read"] += len(chunk)
+            h1, h2 = hash_natural_keys(chunk, key_cols)
+
+            # Repetições dentro do próprio chunk
+            keep = ~pd.DataFrame({"h1": h1, "h2": h2}).duplicated(keep="first").to_numpy()
+
+            # Repetições de chunks anteriores: o Bloom descarta as chaves certamente novas
+            maybe_seen = keep & bloom.might_contain(h1, h2)
+            if maybe_seen.any():
+                keep[maybe_seen] = ~seen.contains(h1[maybe_seen], h2[maybe_seen])
+
+            bloom.add(h1[keep], h2[keep])
+            seen.add(h1[keep], h2[keep])
+            stats["duplicates_dropped"] += int(len(chunk) - keep.sum())
+            yield chunk[keep]
+    finally:
+        seen.close()
+
+def _arrival_order(engine, table_name):
+    """Colunas que ordenam as linhas da mais recente para a mais antiga (ver LOAD_ID_COLUMN)."""
+    schema, _, name = table_name.rpartition(".")
+    columns = {col["name"] for col in inspect(engine).get_columns(name, schema=schema or None)}
+    order_cols = [col for col in (LOAD_TIME_COLUMN, LOAD_ID_COLUMN) if col in columns]
+    if LOAD_ID_COLUMN not in columns:
+        # Sem a chave de carga, a ordem física (ctid) desempata; ela deixa de refletir a
+        # ordem de chegada após UPDATE ou VACUUM
+        order_cols.append("ctid")
+    return ", ".join(f"{col} DESC" for col in order_cols)
+
+def latest_rows_query(engine, table_name, key_cols):
+    """SELECT da versão mais recente (last-write-wins) de cada chave natural da tabela, para uso em subconsultas."""
+    keys = ", ".join(key_cols)
+    return f"SELECT DISTINCT ON ({keys}) * FROM {table_name} ORDER BY {keys}, {_arrival_order(engine, table_name)}"
+
+def read_deduplicated(engine, table_name, key_cols, where=None, sample=None, chunksize=DEDUP_CHUNK_SIZE):
+    """
+    Lê uma tabela Bronze em chunks, removendo linhas repetidas pela chave natural (last-write-wins).
+
+    A leitura e a deduplicação são feitas em streaming, mas o resultado é materializado
+    por completo, como em um pd.read_sql da tabela deduplicada.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): Conexão com o PostgreSQL.
+        table_name (str): Tabela Bronze de origem (opcionalmente qualificada pelo schema).
+        key_cols (list): Colunas da chave natural (ex.: ['transaction_id']).
+        where (str, optional): Filtro SQL adicional aplicado a todas as versões na extração.
+        sample (str, optional): Filtro SQL do modo amostra, avaliado sobre a versão mais recente
+            de cada chave: a chave entra (ou sai) da amostra por inteiro, de modo que uma versão
+            antiga nunca substitui uma reentrega que a levou para fora da amostra.
+
+    Returns:
+        tuple: (pd.DataFrame deduplicado em ordem de carga, número de duplicatas removidas)
+    """
+    order_by = _arrival_order(engine, table_name)
+    if "ctid" in order_by:
+        print(f"  Aviso: {table_name} não tem a coluna {LOAD_ID_COLUMN}; a ordem de chegada é aproximada "
+              f"pela ordem física das linhas. Execute '{MIGRATION_HINT}'.")
+    conditions = [where] if where else []
+    if sample:
+        keys = ", ".join(key_cols)
+        conditions.append(f"({keys}) IN (SELECT {keys} FROM ({latest_rows_query(engine, table_name, key_cols)}) "
+                          f"AS latest WHERE {sample})")
+    where_clause = f" WHERE {' AND '.join(f'({c})' for c in conditions)}" if conditions else ""
+
+    with engine.connect() as conn:
+        expected_items = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}{where_clause}")).scalar()
+
+    stats = {}
+    kept = []
+    # stream_results usa um cursor no servidor: os chunks são lidos e deduplicados um a um
+    with engine.connect().execution_options(stream_results=True) as conn:
+        chunks = pd.read_sql(text(f"SELECT * FROM {table_name}{where_clause} ORDER BY {order_by}"),
+                             conn, chunksize=chunksize)
+        for chunk in deduplicate_chunks(chunks, key_cols, expected_items, stats):
+            kept.append(chunk.iloc[::-1])
+
+    # Restaura a ordem de carga (mais antiga primeiro), como uma leitura sem deduplicação
+    df = pd.concat(kept[::-1], ignore_index=True) if kept else pd.read_sql(
+        text(f"SELECT * FROM {table_name} WHERE false"), engine)
+    return df, stats["duplicates_dropped"]
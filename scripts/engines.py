@@ -0,0 +1,151 @@
+import os
+import inspect
+import functools
+from datetime import datetime
+import pytz
+import pandas as pd
+
+# -------------------------------
+# Variáveis de Configuração
+# -------------------------------
+# Engine de DataFrame que executa as etapas transform_*/build_* dos fatos das camadas Silver e Gold.
+# Pode ser definido por execução: DF_ENGINE=duckdb python 2_silver_layer_construction.py
+# Com duckdb, cada etapa decorada com engine_step roda inteira como uma consulta SQL: os DataFrames
+# de entrada são registrados uma vez e o resultado volta para pandas uma vez, antes da carga.
+# As dimensões de pacientes e payers (uma linha por entidade) e a dimensão de data rodam
+# sempre em pandas. O ganho sobre pandas depende dos núcleos disponíveis para o DuckDB:
+# com um único núcleo os tempos se equivalem (ver benchmark_engines.py).
+DF_ENGINE_VAR = 'DF_ENGINE'
+DEFAULT_DF_ENGINE = 'pandas'
+
+# Coluna com a posição de cada linha nos DataFrames registrados: as consultas ordenam por ela
+# para reproduzir a ordem das linhas (e as SKs geradas) da versão pandas
+ROW_ID = "__row_id"
+
+# Equivalentes SQL dos métodos de string do pandas usados nas transformações:
+# str.strip() (remove espaços e os demais brancos ASCII) e str.title() (cada sequência
+# de letras começa com maiúscula e segue em minúsculas)
+SQL_MACROS = [
+    "CREATE MACRO py_strip(s) AS trim(s, ' ' || chr(9) || chr(10) || chr(11) || chr(12) || chr(13))",
+    r"CREATE MACRO py_title(s) AS array_to_string(list_transform(regexp_extract_all(s, '\pL+|\PL+'), "
+    r"w -> CASE WHEN regexp_matches(w, '^\pL') THEN upper(w[1]) || lower(w[2:]) ELSE w END), '')",
+]
+
+# -------------------------------
+# Engines de DataFrame
+# -------------------------------
+class PandasEngine:
+    """
+    Engine padrão: as etapas executam o próprio código pandas.
+
+    Todas as engines recebem e devolvem pd.DataFrame, de modo que a carga no
+    PostgreSQL não depende da engine escolhida.
+    """
+    name = "pandas"
+
+    def run_step(self, step, sql, arguments):
+        """Executa a etapa com o código pandas da função decorada."""
+        return step(**arguments)
+
+
+class DuckDBEngine(PandasEngine):
+    """
+    Engine DuckDB embarcada (colunar, em memória, multi-thread): executa cada etapa
+    pelo SQL equivalente declarado em engine_step.
+    """
+    name = "duckdb"
+
+    def __init__(self):
+        import duckdb
+        import pyarrow
+        self._pa = pyarrow
+        # Inteiros voltam como Int64 (com nulos), como as SKs e contagens da versão pandas
+        self._types = {pyarrow.int8(): pd.Int64Dtype(), pyarrow.int16(): pd.Int64Dtype(),
+                       pyarrow.int32(): pd.Int64Dtype(), pyarrow.int64(): pd.Int64Dtype()}
+        self._conn = duckdb.connect(database=':memory:')
+        # As colunas de auditoria (TIMESTAMPTZ) voltam em UTC, como na versão pandas
+        self._conn.execute("SET TimeZone = 'UTC'")
+        for macro in SQL_MACROS:
+            self._conn.execute(macro)
+
+    def run_step(self, step, sql, arguments):
+        """
+        Registra os DataFrames recebidos pelos nomes dos parâmetros da etapa (com a coluna de
+        posição ROW_ID) e executa o SQL. Os demais argumentos ficam disponíveis como parâmetros
+        nomeados ($nome), assim como o horário da carga ($now_utc) usado nas colunas de auditoria.
+
+        A troca de dados com o pandas passa por tabelas Arrow nos dois sentidos: é a única
+        conversão da etapa, e evita a leitura e a criação linha a linha das colunas de texto.
+        """
+        params = {"now_utc": datetime.now(pytz.utc).replace(microsecond=0)}
+        # Um cursor por chamada: os registros de tabelas ficam isolados entre threads (ver pipelined_silver_gold)
+        cursor = self._conn.cursor()
+        try:
+            for name, value in arguments.items():
+                if isinstance(value, pd.DataFrame):
+                    frame = value.assign(**{ROW_ID: range(len(value))})
+                    cursor.register(name, self._pa.Table.from_pandas(frame, preserve_index=False))
+                else:
+                    params[name] = value
+            # O DuckDB rejeita parâmetros nomeados que a consulta não usa
+            params = {name: value for name, value in params.items() if f"${name}" in sql}
+            return cursor.execute(sql, params).to_arrow_table().to_pandas(types_mapper=self._types.get)
+        finally:
+            cursor.close()
+
+
+ENGINES = {
+    "pandas": PandasEngine,
+    "duckdb": DuckDBEngine,
+}
+
+# -------------------------------
+# Seleção da Engine Ativa
+# -------------------------------
+_active_engine = None
+
+def use_engine(name):
+    """
+    Define a engine de DataFrame ativa para a execução corrente.
+
+    Raises:
+        ValueError: Se a engine não existir.
+        ImportError: Se a biblioteca da engine (duckdb e pyarrow) não estiver instalada.
+    """
+    global _active_engine
+    name = name.lower()
+    if name not in ENGINES:
+        raise ValueError(f"Engine de DataFrame desconhecida: {name}. Opções: {', '.join(ENGINES)}")
+    _active_engine = ENGINES[name]()
+    return _active_engine
+
+def get_active_engine():
+    """
+    Retorna a engine ativa, inicializando a partir de DF_ENGINE na primeira chamada.
+    A variável é lida aqui, e não na importação, para respeitar o .env carregado pelos scripts de camada.
+    """
+    if _active_engine is None:
+        use_engine(os.getenv(DF_ENGINE_VAR) or DEFAULT_DF_ENGINE)
+    return _active_engine
+
+def engine_step(sql):
+    """
+    Decorador das etapas transform_*/build_* que a engine ativa executa por inteiro.
+
+    O SQL deve produzir as mesmas linhas, na mesma ordem e com as mesmas colunas que o
+    código pandas da função: os DataFrames de entrada são referenciados pelos nomes dos
+    parâmetros, e a ordem das linhas pela coluna ROW_ID. A equivalência é verificada em
+    tests/test_engines.py.
+    """
+    def decorator(step):
+        signature = inspect.signature(step)
+
+        @functools.wraps(step)
+        def run(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return get_active_engine().run_step(step, sql, bound.arguments)
+
+        run.sql = sql
+        return run
+    return decorator
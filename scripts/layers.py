@@ -0,0 +1,37 @@
+import os
+import importlib.util
+
+# -------------------------------
+# Carregamento dos Scripts de Camada
+# -------------------------------
+# Os scripts de camada são numerados (ex.: '2_silver_layer_construction.py') para indicar
+# a ordem de execução, o que impede um 'import' direto. Este módulo os carrega pelo caminho.
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LAYER_SCRIPTS = {
+    "bronze": "1_bronze_layer_construction.py",
+    "silver": "2_silver_layer_construction.py",
+    "gold": "3_gold_layer_construction.py",
+}
+
+_loaded_layers = {}
+
+def load_layer(layer):
+    """
+    Importa (uma única vez) o script da camada informada e retorna o módulo.
+
+    Args:
+        layer (str): 'bronze', 'silver' ou 'gold'.
+
+    Returns:
+        module: O módulo do script, com suas funções transform_*/build_*/load_*.
+    """
+    if layer not in LAYER_SCRIPTS:
+        raise ValueError(f"Camada desconhecida: {layer}. Opções: {', '.join(LAYER_SCRIPTS)}")
+    if layer not in _loaded_layers:
+        path = os.path.join(SCRIPTS_DIR, LAYER_SCRIPTS[layer])
+        spec = importlib.util.spec_from_file_location(f"{layer}_layer", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _loaded_layers[layer] = module
+    return _loaded_layers[layer]
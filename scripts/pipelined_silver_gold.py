@@ -0,0 +1,248 @@
+import queue
+import threading
+import numpy as np
+import pandas as pd
+from layers import load_layer
+from dedup import read_deduplicated
+from checkpoint import ensure_run_state_table, clear_stage
+from query_service import bump_gold_version
+from sampling import bronze_table, bronze_query, patient_filter, claim_filter
+
+# -------------------------------
+# Variáveis de Configuração
+# -------------------------------
+# Linhas por chunk de fato e número máximo de chunks aguardando em cada fila.
+# As filas limitam apenas os chunks Silver em trânsito (~PIPELINE_QUEUE_SIZE + 2 por fato):
+# os fatos Bronze deduplicados ficam inteiros em memória, pois as dimensões dependem de todas as linhas.
+PIPELINE_CHUNK_SIZE = 50_000
+PIPELINE_QUEUE_SIZE = 4
+
+# Intervalo (s) em que produtores e consumidores bloqueados verificam se a execução foi abortada
+_POLL_SECONDS = 0.5
+_END_OF_STREAM = None
+
+# Cada fato: tabela Bronze de origem, filtro do modo amostra, colunas Bronze das quais
+# derivam dimensões Gold, função de transformação Silver e tabelas de destino
+PIPELINE_FACTS = {
+    "claims": {
+        "bronze": "bronze_claims", "key": "claim_id", "sample_filter": lambda engine: patient_filter(),
+        "dimension_columns": [['claim_start_date', 'claim_end_date']],
+        "silver_table": "silver_fact_claim", "gold_table": "gold_fact_claims",
+        "transform": lambda silver, chunk, dims: silver.transform_claims_to_silver(
+            chunk, dims["silver_dim_patient"], dims["silver_dim_provider"]),
+    },
+    "claim_transactions": {
+        "bronze": "bronze_claims_transactions", "key": "transaction_id", "sample_filter": claim_filter,
+        "dimension_columns": [['transaction_date'], ['procedure_code']],
+        "silver_table": "silver_fact_claim_transaction", "gold_table": "gold_fact_claim_transactions",
+        # silver_claims_df não é usado pela transformação (ver load_silver)
+        "transform": lambda silver, chunk, dims: silver.transform_claims_transactions_to_silver(
+            chunk, dims["silver_dim_patient"], dims["silver_dim_provider"], None),
+    },
+    "encounters": {
+        "bronze": "bronze_encounters", "key": "encounter_id", "sample_filter": lambda engine: patient_filter(),
+        "dimension_columns": [['encounter_date', 'discharge_date'], ['encounter_type']],
+        "silver_table": "silver_fact_encounter", "gold_table": "gold_fact_encounters",
+        "transform": lambda silver, chunk, dims: silver.transform_encounters_to_silver(
+            chunk, dims["silver_dim_patient"], dims["silver_dim_provider"], dims["silver_dim_payer"]),
+    },
+}
+
+# -------------------------------
+# Funções Auxiliares
+# -------------------------------
+def _chunks(df, chunksize):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+def _replace_empty(df, table_name, engine, dtype=None):
+    """Recria a tabela de destino vazia, com o esquema de df; os chunks são sempre anexados depois."""
+    df.head(0).to_sql(table_name, engine, if_exists="replace", index=False, dtype=dtype)
+
+def _append_chunk(df, table_name, engine, dtype=None):
+    df.to_sql(table_name, engine, if_exists="append", index=False, dtype=dtype)
+
+def _put(q, item, stop):
+    """queue.put bloqueante (a Gold mais lenta segura a Silver) que desiste se a execução for abortada."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+    return _END_OF_STREAM
+
+def _date_range(silver_facts):
+    """Intervalo de datas da dimensão de data, calculado como em load_gold()."""
+    all_dates = pd.concat([
+        silver_facts["silver_fact_claim"]['claim_start_date'], silver_facts["silver_fact_claim"]['claim_end_date'],
+        silver_facts["silver_fact_claim_transaction"]['transaction_date'],
+        silver_facts["silver_fact_encounter"]['encounter_date'], silver_facts["silver_fact_encounter"]['discharge_date']
+    ]).dropna().drop_duplicates()
+    min_date = all_dates.min() if not all_dates.empty else pd.Timestamp('2020-01-01')
+    max_date = all_dates.max() if not all_dates.empty else pd.Timestamp.today() + pd.DateOffset(years=1)
+    return min_date, max_date
+
+# -------------------------------
+# Produtor e Consumidor de cada Fato
+# -------------------------------
+def _produce(name, fact, bronze_df, dims, engine, q, stop, errors, chunksize):
+    """Transforma cada chunk Bronze em Silver, grava na Silver e o envia para a fila da Gold."""
+    silver = load_layer("silver")
+    try:
+        for chunk in _chunks(bronze_df, chunksize):
+            silver_chunk = fact["transform"](silver, chunk, dims)
+            _append_chunk(silver_chunk, fact["silver_table"], engine)
+            if not _put(q, silver_chunk, stop):
+                return
+    except Exception as e:
+        errors.append(f"{fact['silver_table']}: {e}")
+        stop.set()
+    finally:
+        _put(q, _END_OF_STREAM, stop)
+
+def _consume(name, fact, gold_data, engine, q, stop, errors, counts):
+    """Constrói a Gold de cada chunk Silver recebido e anexa à tabela de fatos Gold."""
+    gold = load_layer("gold")
+    config = gold.FACT_CONFIGS[fact["gold_table"]]
+    counts[fact["gold_table"]] = 0
+    try:
+        while True:
+            silver_chunk = _get(q, stop)
+            if silver_chunk is _END_OF_STREAM:
+                return
+            params = config["params"]({fact["silver_table"]: silver_chunk}, gold_data)
+            gold_chunk = config["builder"](*params)
+            _append_chunk(gold_chunk, fact["gold_table"], engine, dtype=config["dtypes"])
+            counts[fact["gold_table"]] += len(gold_chunk)
+    except Exception as e:
+        errors.append(f"{fact['gold_table']}: {e}")
+        stop.set()
+
+# -------------------------------
+# Função Principal: Silver e Gold em Pipeline
+# -------------------------------
+def load_silver_gold_pipelined(engine=None, chunksize=PIPELINE_CHUNK_SIZE, queue_size=PIPELINE_QUEUE_SIZE):
+    """
+    Carrega Silver e Gold em pipeline: assim que as dimensões estão prontas, cada fato é
+    transformado em chunks, e cada chunk Silver (já com as SKs) segue por uma fila limitada
+    para o builder Gold correspondente, que roda em paralelo.
+
+    Produz as mesmas tabelas que load_silver() seguido de load_gold(). As etapas não usam
+    checkpoint: os registros anteriores das tabelas escritas são invalidados antes da primeira
+    escrita, para que uma falha no meio da carga não deixe checkpoints válidos apontando para
+    tabelas vazias ou parciais (um --resume posterior as reconstrói).
+
+    O uso de memória não é limitado pelas filas: os fatos Bronze deduplicados são lidos por
+    completo antes do pipeline (como em load_silver()), e só os chunks Silver em trânsito
+    entre as threads são limitados.
+    """
+    silver, gold = load_layer("silver"), load_layer("gold")
+    if engine is None:
+        engine = silver.get_engine()
+    if engine is None:
+        print("Não foi possível conectar ao banco de dados. Abortando a carga em pipeline.")
+        return
+
+    try:
+        print("Lendo dados da camada Bronze...")
+        bronze = {
+            "bronze_patients": pd.read_sql(bronze_query("bronze_patients"), engine),
+            "bronze_payers": pd.read_sql(bronze_query("bronze_payers", sampled=False), engine),
+        }
+        for fact in PIPELINE_FACTS.values():
+            bronze[fact["bronze"]], dups = read_deduplicated(
+                engine, bronze_table(fact["bronze"]), [fact["key"]], sample=fact["sample_filter"](engine))
+            print(f"  {fact['bronze']}: {dups} duplicatas removidas.")
+
+        print("Construindo dimensões Silver e Gold...")
+        dims = {
+            "silver_dim_patient": silver.transform_patients_to_silver(bronze["bronze_patients"]),
+            "silver_dim_payer": silver.transform_payers_to_silver(bronze["bronze_payers"]),
+            "silver_dim_provider": silver.transform_providers_to_silver(bronze["bronze_claims"], bronze["bronze_encounters"]),
+        }
+        # Estas tabelas são escritas fora das etapas com checkpoint: invalida os registros
+        # anteriores antes da primeira escrita
+        ensure_run_state_table(engine)
+        for table_name in [*dims, *(f["silver_table"] for f in PIPELINE_FACTS.values())]:
+            clear_stage(engine, "silver", table_name)
+        for table_name in [*gold.DIMENSION_CONFIGS, *gold.FACT_CONFIGS, gold.CLAIM_ACCUMULATING_TABLE]:
+            clear_stage(engine, "gold", table_name)
+
+        for table_name, df in dims.items():
+            df.to_sql(table_name, engine, if_exists="replace", index=False)
+
+        # As dimensões Gold derivadas dos fatos (datas, procedimentos, tipos de encontro) só
+        # precisam das linhas Bronze distintas nas colunas de origem: as transformações Silver
+        # tratam cada linha isoladamente, então o resultado (e a ordem das SKs) é o mesmo da
+        # transformação completa, que fica para os produtores do pipeline
+        dim_sources = dict(dims)
+        for name, fact in PIPELINE_FACTS.items():
+            bronze_df = bronze[fact["bronze"]]
+            first_rows = np.zeros(len(bronze_df), dtype=bool)
+            for cols in fact["dimension_columns"]:
+                first_rows |= ~bronze_df.duplicated(cols).to_numpy()
+            dim_sources[fact["silver_table"]] = fact["transform"](silver, bronze_df[first_rows], dims)
+        min_date, max_date = _date_range(dim_sources)
+
+        gold_data = {}
+        for table_name, config in gold.DIMENSION_CONFIGS.items():
+            gold_data[table_name] = config["builder"](*config["params"](dim_sources, min_date, max_date))
+            gold_data[table_name].to_sql(table_name, engine, if_exists="replace", index=False, dtype=config["dtypes"])
+        print("Dimensões carregadas.")
+
+        # As tabelas de fatos são recriadas vazias antes do pipeline, para que uma execução sem
+        # linhas (ex.: amostra vazia) não deixe as linhas da carga anterior. O esquema vem das
+        # linhas já transformadas para as dimensões, com os mesmos tipos dos chunks
+        for fact in PIPELINE_FACTS.values():
+            silver_sample = dim_sources[fact["silver_table"]]
+            _replace_empty(silver_sample, fact["silver_table"], engine)
+            config = gold.FACT_CONFIGS[fact["gold_table"]]
+            gold_sample = config["builder"](*config["params"]({fact["silver_table"]: silver_sample}, gold_data))
+            _replace_empty(gold_sample, fact["gold_table"], engine, dtype=config["dtypes"])
+    except Exception as e:
+        print(f"Erro durante a extração, a construção das dimensões ou a preparação dos fatos: {e}")
+        return
+
+    print(f"Processando fatos em pipeline (chunks de {chunksize} linhas, filas de {queue_size} chunks)...")
+    stop = threading.Event()
+    errors, counts, threads = [], {}, []
+    for name, fact in PIPELINE_FACTS.items():
+        q = queue.Queue(maxsize=queue_size)
+        threads.append(threading.Thread(target=_produce, name=f"silver-{name}",
+                                        args=(name, fact, bronze[fact["bronze"]], dims, engine, q, stop, errors, chunksize)))
+        threads.append(threading.Thread(target=_consume, name=f"gold-{name}",
+                                        args=(name, fact, gold_data, engine, q, stop, errors, counts)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        print(f"Erro durante a carga em pipeline: {'; '.join(errors)}")
+        return
+    for table_name, rows in counts.items():
+        print(f"  {table_name}: {rows} linhas.")
+
+    try:
+        print(f"Construindo {gold.CLAIM_ACCUMULATING_TABLE}...")
+        snapshot = gold.build_claim_accumulating_snapshot(engine, gold_data)
+        snapshot.to_sql(gold.CLAIM_ACCUMULATING_TABLE, engine, if_exists="replace", index=False,
+                        dtype=gold.CLAIM_ACCUMULATING_DTYPES)
+
+        version = bump_gold_version(engine)
+        print(f"Versão da camada Gold atualizada para {version}.")
+        print("\nCarga em pipeline das camadas Silver e Gold concluída com sucesso.")
+    except Exception as e:
+        print(f"Erro ao finalizar a carga em pipeline: {e}")
+
+if __name__ == "__main__":
+    load_silver_gold_pipelined()
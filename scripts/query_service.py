@@ -0,0 +1,244 @@
+import os
+import re
+import pickle
+import hashlib
+from collections import OrderedDict
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+# -------------------------------
+# Variáveis de Configuração
+# -------------------------------
+# Diretório onde o cache de resultados é persistido entre execuções.
+# Relativo ao diretório 'scripts/', assim como o '../.env'.
+QUERY_CACHE_DIR = "../.query_cache"
+QUERY_CACHE_MAX_ENTRIES = 128
+QUERY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Tabela que guarda a versão da camada Gold, incrementada a cada load_gold() bem-sucedido
+GOLD_VERSION_TABLE = "gold_load_version"
+
+# -------------------------------
+# Versionamento da Camada Gold
+# -------------------------------
+def bump_gold_version(engine):
+    """
+    Incrementa a versão da camada Gold. Deve ser chamada por load_gold() apenas
+    após a carga completa, invalidando todos os resultados em cache.
+
+    Returns:
+        int: A nova versão da camada Gold.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {GOLD_VERSION_TABLE} ("
+            "version BIGINT PRIMARY KEY, loaded_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())"
+        ))
+        version = conn.execute(text(
+            f"INSERT INTO {GOLD_VERSION_TABLE} (version) "
+            f"SELECT COALESCE(MAX(version), 0) + 1 FROM {GOLD_VERSION_TABLE} RETURNING version"
+        )).scalar()
+    return version
+
+def get_gold_version(engine):
+    """
+    Retorna o par (schema corrente, versão da camada Gold).
+    O schema faz parte da chave do cache para que bancos/schemas distintos não colidam.
+    Retorna versão 0 se a Gold ainda não foi carregada com versionamento.
+    """
+    with engine.connect() as conn:
+        schema = conn.execute(text("SELECT current_schema()")).scalar()
+        exists = conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": GOLD_VERSION_TABLE}).scalar()
+        if not exists:
+            return schema, 0
+        version = conn.execute(text(f"SELECT COALESCE(MAX(version), 0) FROM {GOLD_VERSION_TABLE}")).scalar()
+    return schema, int(version)
+
+# -------------------------------
+# Funções Auxiliares
+# -------------------------------
+_SQL_TOKEN_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|(--[^\n]*)|(/\*.*?\*/)|(\s+)", re.DOTALL)
+
+def normalize_sql(sql):
+    """
+    Normaliza o texto SQL para uso como chave de cache: remove comentários,
+    colapsa espaços em branco e o ';' final. Literais e identificadores entre aspas são preservados,
+    e o restante é convertido para minúsculas.
+    """
+    parts = []
+    pos = 0
+    for match in _SQL_TOKEN_RE.finditer(sql):
+        if match.start() > pos:
+            parts.append(sql[pos:match.start()].lower())
+        literal, line_comment, block_comment, whitespace = match.groups()
+        if literal is not None:
+            parts.append(literal)
+        elif parts and parts[-1] != " ":
+            # Comentários e espaços viram um único espaço; literais nunca são alterados
+            parts.append(" ")
+        pos = match.end()
+    parts.append(sql[pos:].lower())
+    return "".join(parts).strip().rstrip(";").strip()
+
+def _make_cache_key(normalized_sql, params, schema, version):
+    """Gera a chave do cache a partir do SQL normalizado, parâmetros e versão da Gold."""
+    payload = repr((normalized_sql, sorted((params or {}).items()), schema, version))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _frame_size(df):
+    """Estima o tamanho em bytes de um DataFrame em memória."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+# -------------------------------
+# Serviço de Consultas com Cache
+# -------------------------------
+class QueryService:
+    """
+    Executa consultas analíticas sobre a camada Gold com cache de resultados.
+
+    Os resultados são indexados pelo SQL normalizado e pela versão da Gold.
+    Quando load_gold() incrementa a versão, as entradas antigas são descartadas
+    automaticamente. O cache é limitado por número de entradas e por bytes (LRU)
+    e persistido em disco para sobreviver entre processos.
+    """
+
+    def __init__(self, engine, cache_dir=QUERY_CACHE_DIR, max_entries=QUERY_CACHE_MAX_ENTRIES,
+                 max_bytes=QUERY_CACHE_MAX_BYTES, persist=True):
+        self.engine = engine
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.persist = persist
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # chave -> (versão, DataFrame, tamanho)
+        self._total_bytes = 0
+        self._version = None
+        if self.persist:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_from_disk()
+
+    def query(self, sql, params=None):
+        """
+        Executa a consulta, servindo do cache quando a Gold não mudou desde a última execução.
+
+        Returns:
+            pd.DataFrame: Uma cópia do resultado (o cache não é afetado por mutações).
+        """
+        schema, version = get_gold_version(self.engine)
+        self._invalidate_if_stale((schema, version))
+
+        key = _make_cache_key(normalize_sql(sql), params, schema, version)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if self.persist:
+                try:
+                    os.utime(self._entry_path(key)) # Mantém a ordem LRU ao recarregar do disco
+                except FileNotFoundError:
+                    pass # Arquivo removido por outro processo; a entrada em memória continua válida
+            return self._entries[key][1].copy()
+
+        self.misses += 1
+        result = pd.read_sql(text(sql), self.engine, params=params)
+        self._store(key, result)
+        return result.copy()
+
+    def clear(self):
+        """Remove todas as entradas do cache, em memória e em disco."""
+        for key in list(self._entries):
+            self._evict(key)
+
+    def stats(self):
+        """Retorna estatísticas de uso do cache."""
+        return {"entries": len(self._entries), "bytes": self._total_bytes,
+                "hits": self.hits, "misses": self.misses, "version": self._version}
+
+    def _invalidate_if_stale(self, version):
+        """Descarta todas as entradas de versões anteriores da Gold."""
+        if self._version == version:
+            return
+        for key, (entry_version, _, _) in list(self._entries.items()):
+            if entry_version != version:
+                self._evict(key)
+        self._version = version
+
+    def _store(self, key, result):
+        size = _frame_size(result)
+        if size > self.max_bytes:
+            return # Resultado maior que o cache inteiro: não vale a pena guardar
+        self._entries[key] = (self._version, result, size)
+        self._total_bytes += size
+        if self.persist:
+            with open(self._entry_path(key), "wb") as f:
+                pickle.dump((self._version, result), f, protocol=pickle.HIGHEST_PROTOCOL)
+        while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._evict(oldest_key)
+
+    def _evict(self, key):
+        _, _, size = self._entries.pop(key)
+        self._total_bytes -= size
+        if self.persist:
+            try:
+                os.remove(self._entry_path(key))
+            except FileNotFoundError:
+                pass
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _load_from_disk(self):
+        """Recarrega as entradas persistidas, da mais antiga para a mais recente (ordem LRU)."""
+        paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".pkl")]
+        for path in sorted(paths, key=os.path.getmtime):
+            key = os.path.basename(path)[:-len(".pkl")]
+            try:
+                with open(path, "rb") as f:
+                    version, result = pickle.load(f)
+            except Exception as e:
+                print(f"Entrada de cache inválida descartada ({path}): {e}")
+                os.remove(path)
+                continue
+            size = _frame_size(result)
+            self._entries[key] = (version, result, size)
+            self._total_bytes += size
+        while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+
+# -------------------------------
+# Execução das consultas de insights
+# -------------------------------
+def read_insight_queries(path="../oltp_queries/insights.sql"):
+    """
+    Lê as consultas de insights.sql, removendo o prefixo EXPLAIN ANALYSE,
+    para que retornem os resultados em vez do plano de execução.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    queries = []
+    for statement in content.split(";"):
+        statement = re.sub(r"^\s*--[^\n]*$", "", statement, flags=re.MULTILINE).strip()
+        if not statement:
+            continue
+        queries.append(re.sub(r"^EXPLAIN\s+ANALY[SZ]E\s+", "", statement, flags=re.IGNORECASE))
+    return queries
+
+if __name__ == "__main__":
+    # Importado aqui para que o módulo possa ser usado sem as credenciais do .env
+    from layers import load_layer
+
+    engine = load_layer("bronze").get_engine()
+    if engine is None:
+        print("Não foi possível conectar ao banco de dados.")
+    else:
+        try:
+            service = QueryService(engine)
+            for sql in read_insight_queries():
+                result = service.query(sql)
+                print(f"{len(result)} linhas: {normalize_sql(sql)[:80]}...")
+            print(f"Estatísticas do cache: {service.stats()}")
+        except SQLAlchemyError as e:
+            print(f"Erro ao executar as consultas de insights: {e}")
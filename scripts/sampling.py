@@ -0,0 +1,139 @@
+import os
+from decimal import Decimal
+from sqlalchemy import text
+from dedup import latest_rows_query
+
+# -------------------------------
+# Variáveis de Configuração
+# -------------------------------
+# Modo amostra: executa toda a lógica Silver/Gold sobre um subconjunto determinístico de pacientes.
+# Ativado por execução: SAMPLE_RATE=0.01 python 2_silver_layer_construction.py
+# (e o mesmo SAMPLE_RATE/SAMPLE_SEED em 3_gold_layer_construction.py)
+# As variáveis são lidas a cada uso, e não na importação, para respeitar o .env carregado
+# pelos scripts de camada (como DF_ENGINE em engines.py)
+SAMPLE_RATE_VAR = 'SAMPLE_RATE'
+SAMPLE_SEED_VAR = 'SAMPLE_SEED'
+
+# Schema que recebe as tabelas Silver/Gold da amostra (e seus checkpoints e versão Gold).
+# Por padrão derivado da taxa e da semente, para que amostras diferentes não se misturem.
+SAMPLE_SCHEMA_VAR = 'SAMPLE_SCHEMA'
+SAMPLE_SCHEMA_PREFIX = "sample_"
+
+# Schema das tabelas Bronze (lidas sempre por nome qualificado em modo amostra)
+BRONZE_SCHEMA_VAR = 'BRONZE_SCHEMA'
+DEFAULT_BRONZE_SCHEMA = 'public'
+
+# O hash do patient_id é mapeado para [0, 2^32); entram na amostra os valores abaixo de rate * 2^32
+_HASH_SPACE = 2 ** 32
+
+# -------------------------------
+# Funções de Amostragem
+# -------------------------------
+def sample_rate():
+    """
+    Taxa de amostragem definida em SAMPLE_RATE (0 fora do modo amostra).
+
+    Raises:
+        ValueError: Se SAMPLE_RATE não for um número em (0, 1].
+    """
+    value = os.getenv(SAMPLE_RATE_VAR) or 0
+    try:
+        rate = float(value)
+    except ValueError:
+        raise ValueError(f"SAMPLE_RATE deve ser um número em (0, 1], recebido {value!r}.") from None
+    if rate and not 0 < rate <= 1:
+        raise ValueError(f"SAMPLE_RATE deve estar em (0, 1], recebido {rate}.")
+    return rate
+
+def sample_seed():
+    """
+    Semente da amostra definida em SAMPLE_SEED (0 por padrão).
+
+    Raises:
+        ValueError: Se SAMPLE_SEED não for um inteiro.
+    """
+    value = os.getenv(SAMPLE_SEED_VAR) or 0
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"SAMPLE_SEED deve ser um inteiro, recebido {value!r}.") from None
+
+def bronze_schema():
+    """Schema das tabelas Bronze definido em BRONZE_SCHEMA."""
+    return os.getenv(BRONZE_SCHEMA_VAR) or DEFAULT_BRONZE_SCHEMA
+
+def is_sampling():
+    """Indica se o modo amostra está ativo (SAMPLE_RATE definido)."""
+    return sample_rate() > 0
+
+def sample_schema():
+    """
+    Nome do schema da amostra, ex.: sample_100bp_seed0 para SAMPLE_RATE=0.01.
+
+    A taxa é escrita em pontos-base sem arredondamento (o ponto decimal vira 'p', ex.:
+    sample_0p5bp_seed0 para SAMPLE_RATE=0.00005), de modo que taxas diferentes nunca
+    compartilham o mesmo schema.
+    """
+    basis_points = format((Decimal(repr(sample_rate())) * 10_000).normalize(), "f").replace(".", "p")
+    return os.getenv(SAMPLE_SCHEMA_VAR) or f"{SAMPLE_SCHEMA_PREFIX}{basis_points}bp_seed{sample_seed()}"
+
+def patient_filter(column="patient_id"):
+    """
+    Predicado SQL que seleciona os pacientes da amostra, ou None fora do modo amostra.
+
+    O hash (md5 da semente + patient_id) não depende da ordem nem do volume dos dados:
+    o mesmo paciente sempre cai na mesma amostra, e a amostra de uma taxa maior contém
+    a de uma taxa menor. Aplicado a pacientes, claims e encontros; as transações seguem
+    o claim a que pertencem (ver claim_filter). Nos fatos, é avaliado sobre a versão mais
+    recente de cada chave (parâmetro sample de dedup.read_deduplicated).
+    """
+    if not is_sampling():
+        return None
+    threshold = int(sample_rate() * _HASH_SPACE)
+    return f"('x' || substr(md5('{sample_seed()}:' || {column}), 1, 8))::bit(32)::bigint < {threshold}"
+
+def claim_filter(engine, column="claim_id"):
+    """
+    Predicado SQL que seleciona as linhas cujo claim pertence a um paciente da amostra,
+    ou None fora do modo amostra.
+
+    Usado para as transações: o patient_id da transação pode divergir do patient_id do claim,
+    e filtrar pelo próprio patient_id deixaria transações sem claim (ou claims sem transações)
+    na amostra. O paciente de cada claim é o da sua versão mais recente, como na Silver.
+    """
+    where = patient_filter("c.patient_id")
+    if where is None:
+        return None
+    latest_claims = latest_rows_query(engine, bronze_table("bronze_claims"), ["claim_id"])
+    return f"{column} IN (SELECT c.claim_id FROM ({latest_claims}) AS c WHERE {where})"
+
+def bronze_table(table_name):
+    """Nome da tabela Bronze a ler: qualificado pelo schema Bronze em modo amostra."""
+    return f"{bronze_schema()}.{table_name}" if is_sampling() else table_name
+
+def bronze_query(table_name, sampled=True):
+    """SELECT de extração de uma tabela Bronze, com o filtro de pacientes quando em modo amostra."""
+    where = patient_filter() if sampled else None
+    return f"SELECT * FROM {bronze_table(table_name)}" + (f" WHERE {where}" if where else "")
+
+def connect_args(search_path=None):
+    """
+    Argumentos de conexão do engine: em modo amostra, o search_path aponta só para o schema
+    da amostra, de modo que as leituras e escritas não qualificadas das camadas Silver e Gold
+    nunca alcancem as tabelas completas. Um search_path explícito tem precedência.
+    """
+    if search_path is None and is_sampling():
+        search_path = sample_schema()
+    return {"options": f"-csearch_path={search_path}"} if search_path else {}
+
+def prepare_sample_schema(engine):
+    """Cria o schema da amostra, se necessário."""
+    if not is_sampling():
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {sample_schema()}"))
+    print(f"Modo amostra: {sample_rate():.2%} dos pacientes (semente {sample_seed()}), tabelas no schema {sample_schema()}.")
+
+def sample_mart_dir(mart_dir):
+    """Diretório do mart analítico: a amostra é publicada em um subdiretório próprio."""
+    return os.path.join(mart_dir, "samples", sample_schema()) if is_sampling() else mart_dir
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------------
+# Geração de Dados Sintéticos da Camada Bronze
+# -------------------------------
+# Usado por benchmarks para produzir volumes maiores que os de insert_into.sql,
+# com o mesmo schema de create_table.sql e as mesmas imperfeições tratadas na Silver
+# (espaços extras, caixa inconsistente, datas invertidas e valores nulos).
+
+FIRST_NAMES = ['alice', 'Bruno ', 'CARLA', 'Daniel', ' eva', 'Felipe', 'Gabriela', 'heitor', None]
+LAST_NAMES = ['Silva', 'santos', 'OLIVEIRA ', 'Pereira', 'Souza', ' costa', 'Martins', None]
+ENCOUNTER_TYPES = ['outpatient', 'Inpatient ', 'EMERGENCY', 'Wellness', 'ambulatory', None]
+PROCEDURE_CODES = [f"{prefix}{n:03d}" for prefix in ('proc', 'PROC ', 'Proc') for n in range(1, 40)] + [None]
+
+def generate_bronze_frames(n_patients=1000, claims_per_patient=5, transactions_per_claim=3,
+                           encounters_per_patient=4, n_providers=None, n_payers=5, seed=42):
+    """
+    Gera DataFrames no formato das tabelas Bronze.
+
+    Args:
+        n_patients (int): Número de pacientes (os demais volumes são proporcionais).
+        seed (int): Semente para que a mesma escala gere sempre os mesmos dados.
+
+    Returns:
+        dict: Nome da tabela Bronze -> pd.DataFrame.
+    """
+    rng = np.random.default_rng(seed)
+    n_providers = n_providers or max(10, n_patients // 50)
+    n_claims = n_patients * claims_per_patient
+    n_transactions = n_claims * transactions_per_claim
+    n_encounters = n_patients * encounters_per_patient
+
+    patient_ids = np.array([f"PAT{i:08d}" for i in range(1, n_patients + 1)])
+    provider_ids = np.array([f"PROV{i:06d}" for i in range(1, n_providers + 1)])
+    payer_ids = np.array([f"PAY{i:03d}" for i in range(1, n_payers + 1)])
+
+    def random_dates(n, start='2021-01-01', days=4 * 365):
+        return pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, n), unit='D')
+
+    patients = pd.DataFrame({
+        'patient_id': patient_ids,
+        'date_of_birth': random_dates(n_patients, start='1935-01-01', days=85 * 365).date,
+        'first_name': rng.choice(np.array(FIRST_NAMES, dtype=object), n_patients),
+        'last_name': rng.choice(np.array(LAST_NAMES, dtype=object), n_patients),
+    })
+
+    payers = pd.DataFrame({
+        'payer_id': payer_ids,
+        'payer_name': [f" payer {i} " for i in range(1, n_payers + 1)],
+    })
+
+    claim_start = random_dates(n_claims)
+    # ~5% das claims têm data de término anterior ao início (corrigido na Silver)
+    claim_end = claim_start + pd.to_timedelta(rng.integers(-10, 60, n_claims), unit='D')
+    claims = pd.DataFrame({
+        'claim_id': [f"CLM{i:09d}" for i in range(1, n_claims + 1)],
+        'patient_id': rng.choice(patient_ids, n_claims),
+        'provider_id': rng.choice(provider_ids, n_claims),
+        'claim_start_date': claim_start.date,
+        'claim_end_date': claim_end.date,
+        'outstanding_primary': rng.uniform(0, 5000, n_claims).round(2),
+        'outstanding_secondary': rng.uniform(0, 1000, n_claims).round(2),
+        'outstanding_patient': rng.uniform(0, 500, n_claims).round(2),
+    })
+
+    claim_idx = rng.integers(0, n_claims, n_transactions)
+    claims_transactions = pd.DataFrame({
+        'transaction_id': [f"TRX{i:010d}" for i in range(1, n_transactions + 1)],
+        'claim_id': claims['claim_id'].to_numpy()[claim_idx],
+        'patient_id': claims['patient_id'].to_numpy()[claim_idx],
+        'provider_id': claims['provider_id'].to_numpy()[claim_idx],
+        'transaction_date': (claim_start[claim_idx] + pd.to_timedelta(rng.integers(0, 90, n_transactions), unit='D')).date,
+        'transaction_amount': rng.uniform(10, 2000, n_transactions).round(2),
+        'procedure_code': rng.choice(np.array(PROCEDURE_CODES, dtype=object), n_transactions),
+    })
+
+    encounter_date = random_dates(n_encounters)
+    discharge_date = encounter_date + pd.to_timedelta(rng.integers(-2, 15, n_encounters), unit='D')
+    total_cost = rng.uniform(100, 20000, n_encounters).round(2)
+    encounters = pd.DataFrame({
+        'encounter_id': [f"ENC{i:09d}" for i in range(1, n_encounters + 1)],
+        'encounter_date': encounter_date.date,
+        'discharge_date': discharge_date.date,
+        'patient_id': rng.choice(patient_ids, n_encounters),
+        'provider_id': rng.choice(provider_ids, n_encounters),
+        'payer_id': rng.choice(payer_ids, n_encounters),
+        'encounter_type': rng.choice(np.array(ENCOUNTER_TYPES, dtype=object), n_encounters),
+        'total_claim_cost': total_cost,
+        'payer_coverage': (total_cost * rng.uniform(0, 1, n_encounters)).round(2),
+    })
+
+    return {
+        "bronze_patients": patients,
+        "bronze_payers": payers,
+        "bronze_claims": claims,
+        "bronze_claims_transactions": claims_transactions,
+        "bronze_encounters": encounters,
+    }
@@ -0,0 +1,54 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Os scripts do pipeline são importados pelo nome, como quando executados a partir de 'scripts/'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from engines import use_engine # noqa: E402
+from synthetic_data import generate_bronze_frames # noqa: E402
+from benchmark_engines import run_transforms # noqa: E402
+
+try:
+    import duckdb # noqa: F401
+    from analytic_mart import publish_gold_to_mart, connect_mart
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+
+@unittest.skipUnless(HAS_DUCKDB, "duckdb é necessário para o mart analítico")
+class PublishGoldToMartTest(unittest.TestCase):
+    """Um fato que fica sem linhas deve continuar consultável no mart, com o mesmo schema."""
+
+    def setUp(self):
+        use_engine("pandas")
+        tables = run_transforms(generate_bronze_frames(n_patients=50))
+        self.gold = {name: df for name, df in tables.items() if name.startswith("gold_")}
+        self.mart_dir = tempfile.mkdtemp(prefix="mart_")
+
+    def tearDown(self):
+        shutil.rmtree(self.mart_dir, ignore_errors=True)
+
+    def describe(self, table_name):
+        conn = connect_mart(self.mart_dir)
+        try:
+            columns = conn.execute(f"DESCRIBE {table_name}").fetchall()
+            count = conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        finally:
+            conn.close()
+        return [(name, column_type) for name, column_type, *_ in columns], count
+
+    def test_empty_fact_keeps_view(self):
+        publish_gold_to_mart(self.gold, mart_dir=self.mart_dir)
+        columns, _ = self.describe("gold_fact_claim_transactions")
+
+        self.gold["gold_fact_claim_transactions"] = self.gold["gold_fact_claim_transactions"].head(0)
+        publish_gold_to_mart(self.gold, mart_dir=self.mart_dir)
+        self.assertEqual(self.describe("gold_fact_claim_transactions"), (columns, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
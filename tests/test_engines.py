@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+import numpy as np
+import pandas as pd
+
+# Os scripts do pipeline são importados pelo nome, como quando executados a partir de 'scripts/'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from engines import use_engine # noqa: E402
+from layers import load_layer # noqa: E402
+from synthetic_data import generate_bronze_frames # noqa: E402
+from benchmark_engines import run_transforms, assert_equivalent # noqa: E402
+
+try:
+    import duckdb # noqa: F401
+    import pyarrow # noqa: F401
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+
+def with_gaps(bronze):
+    """Acrescenta aos dados sintéticos valores nulos e chaves sem dimensão correspondente."""
+    bronze = {name: df.copy() for name, df in bronze.items()}
+    claims = bronze["bronze_claims"]
+    claims.loc[::17, "outstanding_primary"] = np.nan
+    claims.loc[::19, "claim_start_date"] = None
+    claims.loc[::23, "patient_id"] = "PAT_SEM_CADASTRO"
+    transactions = bronze["bronze_claims_transactions"]
+    transactions.loc[::13, "transaction_amount"] = np.nan
+    transactions.loc[::29, "transaction_date"] = None
+    transactions.loc[::31, "provider_id"] = None
+    encounters = bronze["bronze_encounters"]
+    encounters.loc[::11, "discharge_date"] = None
+    encounters.loc[::37, "encounter_type"] = "  day-hospital\t"
+    return bronze
+
+
+@unittest.skipUnless(HAS_DUCKDB, "duckdb e pyarrow são necessários para a engine DuckDB")
+class DuckDBEngineEquivalenceTest(unittest.TestCase):
+    """A engine DuckDB deve produzir as mesmas tabelas Silver e Gold que a engine pandas."""
+
+    def tearDown(self):
+        use_engine("pandas")
+
+    def assert_engines_match(self, bronze):
+        use_engine("pandas")
+        expected = run_transforms(bronze)
+        use_engine("duckdb")
+        actual = run_transforms(bronze)
+        assert_equivalent(expected, actual, "duckdb")
+
+    def test_synthetic_bronze(self):
+        self.assert_engines_match(generate_bronze_frames(n_patients=300))
+
+    def test_nulls_and_unmatched_keys(self):
+        self.assert_engines_match(with_gaps(generate_bronze_frames(n_patients=300, seed=7)))
+
+    def test_claim_accumulating_snapshot(self):
+        gold = load_layer("gold")
+        use_engine("pandas")
+        tables = run_transforms(generate_bronze_frames(n_patients=200))
+        fact_claims = tables["gold_fact_claims"]
+        # Rollup de parte das claims (as demais ficam sem transações) e SKs já atribuídas a algumas delas
+        rollup = pd.DataFrame({
+            "claim_id": fact_claims["claim_id"].iloc[::2].to_numpy(),
+            "transaction_count": 3,
+            "total_transaction_amount": 150.25,
+            "first_transaction_date": pd.Timestamp("2022-03-01").date(),
+            "last_transaction_date": pd.Timestamp("2022-04-15").date(),
+        })
+        claim_keys = pd.DataFrame({"claim_id": fact_claims["claim_id"].iloc[10:40:3].to_numpy(),
+                                   "claim_sk": pd.array(range(500, 510), dtype="Int64")})
+
+        results = {}
+        for engine_name in ("pandas", "duckdb"):
+            use_engine(engine_name)
+            results[engine_name] = {"gold_fact_claim_accumulating": gold.build_fact_claim_accumulating(
+                fact_claims.copy(), rollup, tables["gold_dim_date"], claim_keys)}
+        assert_equivalent(results["pandas"], results["duckdb"], "duckdb")
+
+
+if __name__ == "__main__":
+    unittest.main()